@@ -1,11 +1,10 @@
 import os
-from datetime import datetime
-from typing import AsyncGenerator
+from datetime import datetime, timezone
+from typing import AsyncGenerator, Optional
 
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, ToolMessage
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
 
 from mint_agent.agent_api.messages import (
     AgentMessage,
@@ -13,13 +12,22 @@ from mint_agent.agent_api.messages import (
     UserMessage,
     UserMessageType,
 )
-from mint_agent.agent_graph.graph import compile_workflow, create_graph
+from mint_agent.agent_graph.graph import get_workflow
+from mint_agent.agent_graph.nodes.tool_executor import (
+    get_pending_tool_calls,
+    prefetcher,
+)
 from mint_agent.agent_state.state import (
     GraphState,
     HistoryManagement,
     HistoryManagementType,
 )
-from mint_agent.database.db_utils import MongoDBUsageTracker
+from mint_agent.database.db_utils import (
+    MongoDBUsageTracker,
+    get_async_client,
+    get_db_name,
+)
+from mint_agent.llm.AnthropicController import get_cache_usage
 from mint_agent.llm.ChatFactory import ProviderConfig
 from mint_agent.tools.ToolController import ToolController
 from mint_agent.utils.AgentLogger import AgentLogger
@@ -40,20 +48,17 @@ class AgentMint:
         ip_addr: str,
         is_advanced: bool,
     ) -> None:
-        tools = ToolController.get_tools()
         self.state = None
+        self.final_values = None
         self.chat_id = chat_id
         self.user_id = user_id
         self.ip_addr = ip_addr
         self.is_advanced = is_advanced
 
-        self.graph = create_graph(tools)
-        self.app = compile_workflow(self.graph, user_id)
+        self.app = get_workflow()
 
         self.usage_tracker = MongoDBUsageTracker(
-            AsyncIOMotorClient(os.getenv("MONGO_URI")),
-            os.getenv("MONGO_DB_NAME"),
-            user_id,
+            get_async_client(), get_db_name(), user_id
         )
 
         self.history_config = HistoryManagement(
@@ -72,31 +77,41 @@ class AgentMint:
 
         self.agent_logger = AgentLogger(self.user_id, self.chat_id, self.ip_addr)
 
-    async def set_state(self) -> None:
+    async def set_state(self, values: Optional[dict] = None) -> None:
         """
-        Set the agent's state based on the previous state stored in the database.
+        Set the agent's state based on the given state values or, if not provided, on the previous state stored in the database.
+
+        Args:
+            values (Optional[dict]): State values returned by the graph run.
         """
         try:
-            prev_state = await self.app.aget_state(self.config)
+            if values is None:
+                values = (await self.app.aget_state(self.config)).values
             self.state = GraphState(
-                messages=prev_state.values["messages"],
+                messages=values["messages"],
                 user=self.user_id,
                 provider=os.environ.get("LLM_PROVIDER", "ANTHROPIC"),
                 model_name=os.environ.get("LLM_MODEL", "claude-3-haiku-20240307"),
                 tools=ToolController.get_default_tools(),
                 safe_tools=ToolController.get_safe_tools(),
-                tool_accept=prev_state.values.get("tool_accept", False),
+                tool_accept=values.get("tool_accept", False),
                 history_config=self.history_config,
-                conversation_summary=prev_state.values.get(
+                conversation_summary=values.get(
                     "conversation_summary", None
                 ),
-                system_prompt=prev_state.values.get("system_prompt", None),
-                history_token_count=prev_state.values.get("history_token_count", 0),
+                system_prompt=values.get("system_prompt", None),
+                history_token_count=values.get("history_token_count", 0),
             )
         except Exception as e:
             logger.error(f"Failed to get previous state: {e}")
             raise
 
+    async def close(self) -> None:
+        """
+        Release resources of the session, writing buffered usage data.
+        """
+        await self.usage_tracker.close()
+
     def visualize_graph(self) -> None:
         """
         Visualize the agent's graph schema and save it as a PNG file.
@@ -116,8 +131,12 @@ class AgentMint:
         Raises:
             Exception: If an error occurs during the agent's execution
         """
-        await self.set_state()
+        # State is kept between turns, the database is read only at the start of the session
+        # or after a failed run, when the in-memory state may differ from the last checkpoint
+        if self.state is None:
+            await self.set_state()
         self.agent_logger.start(self.state)
+        self.final_values = None
 
         try:
             self.handle_message(message)
@@ -127,15 +146,17 @@ class AgentMint:
                 input=self.state, version="v2", config=self.config
             ):
                 output = await self.handle_graph_event(event)
-                if output is not None:
+                if isinstance(output, AgentMessage):
                     yield output.to_json()
+                elif output is not None:
+                    yield output
             yield AgentMessage(type=AgentMessageType.AGENT_END).to_json()
         except Exception as e:
-            await self.set_state()
             self.agent_logger.end_error(self.state, e)
+            self.state = None
             raise
 
-        await self.set_state()
+        await self.set_state(self.final_values)
         self.agent_logger.end(self.state)
 
     def handle_message(self, message: UserMessage) -> None:
@@ -150,6 +171,7 @@ class AgentMint:
         """
         match message.type:
             case UserMessageType.INPUT.value:
+                self.discard_prefetched_tools()
                 self.state["messages"].append(
                     HumanMessage(content=f"{message.content}")
                 )
@@ -157,23 +179,33 @@ class AgentMint:
             case UserMessageType.TOOL_CONFIRM.value:
                 self.state["tool_accept"] = True
             case UserMessageType.TOOL_REJECT.value:
-                tool_call_message = self.state["messages"][-1].tool_calls[0]
+                tool_calls = get_pending_tool_calls(self.state["messages"])
+                self.discard_prefetched_tools()
                 self.state["tool_accept"] = False
-                self.state["messages"].append(
-                    ToolMessage(
-                        tool_call_id=tool_call_message["id"],
-                        content="Tool call rejected by the user.",
+                for tool_call in tool_calls:
+                    self.state["messages"].append(
+                        ToolMessage(
+                            tool_call_id=tool_call["id"],
+                            content="Tool call rejected by the user.",
+                        )
                     )
-                )
+                tool_names = ", ".join(tool_call["name"] for tool_call in tool_calls)
                 self.state["messages"].append(
                     HumanMessage(
-                        content=f"I rejected the use of the tool {tool_call_message["name"]} {f"because: {message.content}." if message.content else "and i don't want to provide a reason."}"
+                        content=f"I rejected the use of the {"tools" if len(tool_calls) > 1 else "tool"} {tool_names} {f"because: {message.content}." if message.content else "and i don't want to provide a reason."}"
                     )
                 )
             case _:
                 raise ValueError(f"Unknown message type: {message.type}")
 
-    async def handle_graph_event(self, event: dict) -> AgentMessage | None:
+    def discard_prefetched_tools(self) -> None:
+        """
+        Cancel speculative executions of tool calls that will not be accepted.
+        """
+        for tool_call in get_pending_tool_calls(self.state["messages"]):
+            prefetcher.discard(self.chat_id, tool_call["id"])
+
+    async def handle_graph_event(self, event: dict) -> AgentMessage | dict | None:
         """
         Handle various graph events and update the agent's state accordingly.
 
@@ -182,7 +214,8 @@ class AgentMint:
             agent_logger: The logger instance to log usage data.
 
         Returns:
-            AgentMessage | None: The message to be sent based on the event type, or None if no message is to be sent.
+            AgentMessage | dict | None: The message to be sent based on the event type, or None if no message is to be sent.
+            LLM text chunks are returned as plain JSON dicts, the message is built once per batch of chunks by StreamWriter.
         """
         event_kind = event["event"]
         output = None
@@ -192,14 +225,15 @@ class AgentMint:
                     content = event["data"]["chunk"].content
                     if content:
                         if isinstance(content, str):
-                            output = AgentMessage(
-                                type=AgentMessageType.LLM_TEXT, content=content
-                            )
+                            output = {
+                                "type": AgentMessageType.LLM_TEXT.value,
+                                "content": content,
+                            }
                         elif content[-1]["type"] == "text":
-                            output = AgentMessage(
-                                type=AgentMessageType.LLM_TEXT,
-                                content=content[-1]["text"],
-                            )
+                            output = {
+                                "type": AgentMessageType.LLM_TEXT.value,
+                                "content": content[-1]["text"],
+                            }
             case "on_chat_model_start":
                 output = AgentMessage(type=AgentMessageType.LLM_START)
             case "on_chat_model_end":
@@ -211,13 +245,13 @@ class AgentMint:
 
                 if returns_usage_data:
                     usage_data = {
-                        "tokens": event["data"]["output"].usage_metadata,
-                        "timestamp": datetime.now(),
+                        "tokens": {
+                            **event["data"]["output"].usage_metadata,
+                            **get_cache_usage(event["data"]["output"]),
+                        },
+                        "timestamp": datetime.now(timezone.utc),
                     }
-                    await self.usage_tracker.push_token_usage(usage_data)
-                    self.state["history_token_count"] = event["data"][
-                        "output"
-                    ].usage_metadata["input_tokens"]
+                    self.usage_tracker.push_token_usage(usage_data)
                     self.agent_logger.set_usage_data(usage_data)
             case "on_tool_start":
                 if self.is_advanced:
@@ -231,12 +265,28 @@ class AgentMint:
                     output = AgentMessage(
                         type=AgentMessageType.TOOL_END,
                     )
+            case "on_chain_end":
+                # The graph run ends last, so its output holds the final state values
+                if not event.get("parent_ids"):
+                    self.final_values = event["data"]["output"]
             case "on_custom_event":
                 if event["name"] == "tool_accept":
                     output = AgentMessage(
                         type=AgentMessageType.ACCEPT_REQUEST,
                         tool_input=event["data"]["params"],
                         tool_name=event["data"]["tool"],
+                        tool_calls=event["data"]["tool_calls"],
+                        tool_count=event["data"]["tool_count"],
+                    )
+                elif event["name"] == "prefetched_tool_start" and self.is_advanced:
+                    output = AgentMessage(
+                        type=AgentMessageType.TOOL_START,
+                        tool_name=event["data"]["tool"],
+                        tool_input=event["data"]["input"],
+                    )
+                elif event["name"] == "prefetched_tool_end" and self.is_advanced:
+                    output = AgentMessage(
+                        type=AgentMessageType.TOOL_END,
                     )
 
         return output
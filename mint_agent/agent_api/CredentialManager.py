@@ -1,22 +1,63 @@
 import os
+from functools import cache
+from typing import Optional
 
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 
+from mint_agent.database.db_utils import get_async_client, get_db_name, get_sync_client
+from mint_agent.utils.cache import TTLCache
+
 load_dotenv()
 
+# Successful authentications and decrypted credentials, keyed by (kind, user_id, ...)
+credential_cache = TTLCache(
+    max_size=int(os.getenv("CREDENTIAL_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("CREDENTIAL_CACHE_TTL", 60)),
+)
+
+
+@cache
+def get_fernet() -> Fernet:
+    return Fernet(os.getenv("FERNET_KEY").encode())
+
 
 class CredentialManager:
     """
     Manages credentials required for agent workflow.
+
+    Every lookup has a blocking and an asynchronous (prefixed with 'a') variant, both sharing
+    a short-lived cache of successful authentications and decrypted credentials.
+
+    Unless clients are passed, the shared clients are fetched on every use, so a long-lived
+    manager does not keep a client closed on application shutdown.
     """
 
-    def __init__(self):
-        db_uri = os.getenv("MONGO_URI")
-        db_name = os.getenv("MONGO_DB_NAME")
-        self.client = MongoClient(db_uri)
-        self.db = self.client[db_name]
+    def __init__(
+        self,
+        client: Optional[MongoClient] = None,
+        async_client: Optional[AsyncIOMotorClient] = None,
+    ):
+        self._client = client
+        self._async_client = async_client
+
+    @property
+    def client(self) -> MongoClient:
+        return self._client or get_sync_client()
+
+    @property
+    def db(self):
+        return self.client[get_db_name()]
+
+    @property
+    def async_client(self) -> AsyncIOMotorClient:
+        return self._async_client or get_async_client()
+
+    @property
+    def async_db(self):
+        return self.async_client[get_db_name()]
 
     def authenticate_user(self, user_id: str, token: str) -> bool:
         """
@@ -29,8 +70,26 @@ class CredentialManager:
         Returns:
             bool: True if the user is authenticated, False otherwise.
         """
+        cache_key = ("auth", user_id, token)
+        if credential_cache.get(cache_key):
+            return True
         collection = self.db[user_id]
         user = collection.find_one({"_id": user_id, "mint_user_id": token})
+        if user:
+            credential_cache.set(cache_key, True)
+        return bool(user)
+
+    async def aauthenticate_user(self, user_id: str, token: str) -> bool:
+        """
+        Asynchronous version of authenticate_user.
+        """
+        cache_key = ("auth", user_id, token)
+        if credential_cache.get(cache_key):
+            return True
+        collection = self.async_db[user_id]
+        user = await collection.find_one({"_id": user_id, "mint_user_id": token})
+        if user:
+            credential_cache.set(cache_key, True)
         return bool(user)
 
     def get_system_credentials(
@@ -49,37 +108,78 @@ class CredentialManager:
             and credential type or tuple of None if not found or error occurred.
 
         """
-        KEY = os.getenv("FERNET_KEY").encode()
-        f = Fernet(KEY)
+        cache_key = ("credentials", user_id, system, credential_type)
+        credentials = credential_cache.get(cache_key)
+        if credentials is not None:
+            return credentials
         try:
-            match system:
-                case "MintHCM":
-                    if credential_type == "APIv8":
-                        collection = self.db[user_id]
-                    else:
-                        raise ValueError(
-                            f"Credential type '{credential_type}' not supported"
-                        )
-
-                    user_data = collection.find_one(
-                        {
-                            "user_credentials": {
-                                "$elemMatch": {
-                                    "system": system,
-                                    "credential_type": credential_type,
-                                }
-                            }
-                        },
-                        {"user_credentials.$": 1},
-                    )
+            query, projection = self._credentials_query(system, credential_type)
+            user_data = self.db[user_id].find_one(query, projection)
+            credentials = self._decrypt_credentials(user_data)
+        except Exception:
+            return None, None
+        credential_cache.set(cache_key, credentials)
+        return credentials
 
-                    if user_data and "user_credentials" in user_data:
-                        credential = user_data["user_credentials"][0]
-                        client_id = credential["credentials"]["client_id"]
-                        secret = credential["credentials"]["secret"]
-                        return client_id, f.decrypt(secret).decode()
-                    raise ValueError("Credentials not found")
-                case _:
-                    raise ValueError(f"System '{system}' not supported")
+    async def aget_system_credentials(
+        self, user_id: str, system: str, credential_type: str
+    ) -> tuple:
+        """
+        Asynchronous version of get_system_credentials.
+        """
+        cache_key = ("credentials", user_id, system, credential_type)
+        credentials = credential_cache.get(cache_key)
+        if credentials is not None:
+            return credentials
+        try:
+            query, projection = self._credentials_query(system, credential_type)
+            user_data = await self.async_db[user_id].find_one(query, projection)
+            credentials = self._decrypt_credentials(user_data)
         except Exception:
             return None, None
+        credential_cache.set(cache_key, credentials)
+        return credentials
+
+    @staticmethod
+    def invalidate(user_id: Optional[str] = None) -> None:
+        """
+        Drop cached authentications and credentials, e.g. after user credentials have changed.
+
+        Args:
+            user_id (Optional[str]): The user whose entries should be dropped, all users if None.
+        """
+        if user_id is None:
+            credential_cache.clear()
+        else:
+            credential_cache.invalidate(lambda key: key[1] == user_id)
+
+    @staticmethod
+    def _credentials_query(system: str, credential_type: str) -> tuple[dict, dict]:
+        match system:
+            case "MintHCM":
+                if credential_type != "APIv8":
+                    raise ValueError(
+                        f"Credential type '{credential_type}' not supported"
+                    )
+                return (
+                    {
+                        "user_credentials": {
+                            "$elemMatch": {
+                                "system": system,
+                                "credential_type": credential_type,
+                            }
+                        }
+                    },
+                    {"user_credentials.$": 1},
+                )
+            case _:
+                raise ValueError(f"System '{system}' not supported")
+
+    @staticmethod
+    def _decrypt_credentials(user_data: Optional[dict]) -> tuple:
+        if user_data and "user_credentials" in user_data:
+            credential = user_data["user_credentials"][0]
+            client_id = credential["credentials"]["client_id"]
+            secret = credential["credentials"]["secret"]
+            return client_id, get_fernet().decrypt(secret).decode()
+        raise ValueError("Credentials not found")
@@ -0,0 +1,148 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from loguru import logger
+
+from mint_agent.agent_api.messages import AgentMessage, AgentMessageType
+
+load_dotenv()
+
+# Queue markers requesting to send the collected text and to stop the sending task
+_FLUSH = object()
+_CLOSE = object()
+
+
+class StreamWriter:
+    """
+    Writes agent messages to the client, coalescing consecutive LLM_TEXT chunks into one message
+    sent at most flush_interval after its first chunk or once it reaches max_batch_size characters.
+    Messages are passed to the sending task through a bounded queue, so writing waits when the
+    client does not keep up and the agent output is slowed down instead of buffered without limit.
+
+    Attributes:
+        flush_interval (float): Number of seconds text chunks are collected for, set with STREAM_FLUSH_INTERVAL variable (in milliseconds).
+        max_batch_size (int): Number of characters after which collected text is sent, set with STREAM_MAX_BATCH_SIZE variable.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict], Awaitable[None]],
+        flush_interval: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+    ) -> None:
+        """
+        Start the sending task.
+
+        Args:
+            send (Callable[[dict], Awaitable[None]]): Coroutine function sending one message to the client.
+            flush_interval (Optional[float]): Number of seconds text chunks are collected for.
+            max_batch_size (Optional[int]): Number of characters after which collected text is sent.
+            max_queue_size (Optional[int]): Number of messages waiting to be sent, after which writing waits. Defaults to STREAM_QUEUE_SIZE variable.
+        """
+        self.send = send
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else float(os.getenv("STREAM_FLUSH_INTERVAL", 30)) / 1000
+        )
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("STREAM_MAX_BATCH_SIZE", 1024)
+        )
+        self._queue = asyncio.Queue(
+            maxsize=max_queue_size or int(os.getenv("STREAM_QUEUE_SIZE", 256))
+        )
+        self._text: list[str] = []
+        self._text_size = 0
+        self._error: Optional[Exception] = None
+        self._sender = asyncio.create_task(self._run())
+
+    async def write(self, message: dict) -> None:
+        """
+        Queue the message to be sent, waiting if the queue is full.
+
+        Args:
+            message (dict): The JSON-serializable message.
+
+        Raises:
+            Exception: The error that occurred while sending previous messages.
+        """
+        if self._error is not None:
+            raise self._error
+        await self._queue.put(message)
+
+    async def flush(self) -> None:
+        """
+        Wait until all written messages are sent, including collected text.
+
+        Raises:
+            Exception: The error that occurred while sending messages.
+        """
+        await self._queue.put(_FLUSH)
+        await self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    async def close(self) -> None:
+        """
+        Send the written messages and stop the sending task. Sending errors are not raised.
+        """
+        if self._sender.done():
+            return
+        await self._queue.put(_CLOSE)
+        await self._sender
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                message = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._send_text()
+                deadline = None
+                continue
+
+            try:
+                if message is _FLUSH or message is _CLOSE:
+                    await self._send_text()
+                    deadline = None
+                    if message is _CLOSE:
+                        return
+                elif message.get("type") == AgentMessageType.LLM_TEXT.value:
+                    if not self._text:
+                        deadline = loop.time() + self.flush_interval
+                    self._text.append(message["content"])
+                    self._text_size += len(message["content"])
+                    if self._text_size >= self.max_batch_size:
+                        await self._send_text()
+                        deadline = None
+                else:
+                    await self._send_text()
+                    deadline = None
+                    await self._send(message)
+            finally:
+                self._queue.task_done()
+
+    async def _send_text(self) -> None:
+        if not self._text:
+            return
+        content = "".join(self._text)
+        self._text.clear()
+        self._text_size = 0
+        await self._send(
+            AgentMessage(type=AgentMessageType.LLM_TEXT, content=content).to_json()
+        )
+
+    async def _send(self, message: dict) -> None:
+        # After a failure the remaining messages are dropped, so writers waiting on the queue are released
+        if self._error is not None:
+            return
+        try:
+            await self.send(message)
+        except Exception as e:
+            logger.debug(f"Stopped sending stream messages: {e}")
+            self._error = e
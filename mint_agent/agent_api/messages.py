@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
 from loguru import logger
 
@@ -61,6 +61,8 @@ class AgentMessage:
         content (Optional[str]): The content of the message.
         tool_name (Optional[str]): The name of the tool.
         tool_input (Optional[str]): The input to the tool.
+        tool_calls (Optional[list]): All tool calls awaiting acceptance, each with id, tool and params.
+        tool_count (Optional[int]): Number of tool calls awaiting acceptance, all of them are accepted by a confirmation.
     """
 
     def __init__(
@@ -69,20 +71,31 @@ class AgentMessage:
         content: Optional[str] = None,
         tool_name: Optional[str] = None,
         tool_input: Optional[str] = None,
+        tool_calls: Optional[list] = None,
+        tool_count: Optional[int] = None,
     ):
         self.type = type
         self.content = content
         self.tool_input = tool_input
         self.tool_name = tool_name
+        self.tool_calls = tool_calls
+        self.tool_count = tool_count
 
-    def to_json(self) -> Dict[str, str]:
+    # Fields sent as JSON structures, other fields are sent as strings
+    structured_fields = ("tool_calls", "tool_count")
+
+    def to_json(self) -> Dict[str, Any]:
         """
         Convert the AgentMessage instance to a JSON-serializable dictionary.
 
         Returns:
-            Dict[str, str]: The JSON-serializable dictionary representing the AgentMessage instance.
+            Dict[str, Any]: The JSON-serializable dictionary representing the AgentMessage instance.
         """
-        return {k: str(v) for k, v in self.__dict__.items() if v is not None}
+        return {
+            k: v if k in self.structured_fields else str(v)
+            for k, v in self.__dict__.items()
+            if v is not None
+        }
 
 
 class UserMessage:
@@ -1,16 +1,24 @@
-import os
+from functools import cache, partial
 
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.graph import CompiledGraph
-from langgraph.prebuilt import ToolNode
-from motor.motor_asyncio import AsyncIOMotorClient
 
 from mint_agent.agent_graph.nodes.gear_manager import gear_manager
 from mint_agent.agent_graph.nodes.history_manager import history_manager
 from mint_agent.agent_graph.nodes.llm_call import llm_call
+from mint_agent.agent_graph.nodes.tool_executor import (
+    ToolExecutor,
+    get_approved_tool_calls,
+    get_pending_tool_calls,
+)
 from mint_agent.agent_graph.nodes.tool_permit import tool_permit
 from mint_agent.agent_state.state import GraphState
-from mint_agent.database.db_utils import MongoDBCheckpointSaver
+from mint_agent.database.db_utils import (
+    MongoDBCheckpointSaver,
+    get_async_client,
+    get_db_name,
+)
+from mint_agent.tools.ToolController import ToolController
 
 
 def should_continue(state) -> str:
@@ -23,13 +31,19 @@ def should_continue(state) -> str:
 
 
 def check_user_decision(state) -> str:
-    decision = state["tool_accept"]
-    if decision:
+    if get_approved_tool_calls(state):
         return "safe"
     else:
         return "unsafe"
 
 
+def check_pending_tools(state) -> str:
+    if get_pending_tool_calls(state["messages"]):
+        return "pending"
+    else:
+        return "done"
+
+
 def check_message_type(state) -> str:
     if state["tool_accept"]:
         return "confirmation"
@@ -39,10 +53,16 @@ def check_message_type(state) -> str:
 
 def create_graph(tools: list) -> StateGraph:
     graph = StateGraph(GraphState)
+    tool_executor = ToolExecutor(
+        tools, read_only_tools=ToolController.get_read_only_tools()
+    )
 
     graph.add_node("llm_node", llm_call)
-    graph.add_node("tool_node", ToolNode(tools))
-    graph.add_node("tool_controller_node", tool_permit)
+    graph.add_node("tool_node", tool_executor)
+    graph.add_node(
+        "tool_controller_node",
+        partial(tool_permit, prefetch=tool_executor.prefetch),
+    )
     graph.add_node("gear_manager_node", gear_manager)
     graph.add_node("history_manager_node", history_manager)
 
@@ -63,17 +83,26 @@ def create_graph(tools: list) -> StateGraph:
         check_user_decision,
         {"safe": "tool_node", "unsafe": END},
     )
-    graph.add_edge("tool_node", "llm_node")
+    graph.add_conditional_edges(
+        "tool_node",
+        check_pending_tools,
+        {"pending": END, "done": "llm_node"},
+    )
 
     return graph
 
 
-def compile_workflow(graph: StateGraph, username: str) -> CompiledGraph:
-    MONGO_URI = os.getenv("MONGO_URI")
-    DB_NAME = os.getenv("MONGO_DB_NAME")
-    checkpointer = MongoDBCheckpointSaver(
-        AsyncIOMotorClient(MONGO_URI), DB_NAME, username
-    )
+def compile_workflow(graph: StateGraph) -> CompiledGraph:
+    checkpointer = MongoDBCheckpointSaver(get_async_client(), get_db_name())
     workflow = graph.compile(checkpointer=checkpointer)
 
     return workflow
+
+
+@cache
+def get_workflow() -> CompiledGraph:
+    """
+    Returns the agent workflow compiled once per process and shared by all connections.
+    User specific parts are resolved from the run config.
+    """
+    return compile_workflow(create_graph(ToolController.get_tools()))
@@ -1,13 +1,20 @@
 import asyncio
-from typing import Any
+import contextvars
+import os
+from typing import Any, Optional
 
+from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
 from loguru import logger
 
 from mint_agent.agent_state.state import GraphState, HistoryManagementType
 from mint_agent.llm.ChatFactory import ChatFactory
 from mint_agent.prompts.PromptController import PromptController
 from mint_agent.utils.errors import AgentError
+from mint_agent.utils.token_counter import count_tokens, find_token_cut
+
+load_dotenv()
 
 
 async def prepare_summary(messages: list[Any], state: dict[str, Any]) -> str:
@@ -22,7 +29,7 @@ async def prepare_summary(messages: list[Any], state: dict[str, Any]) -> str:
     ]
     try:
         llm_model = ChatFactory.get_model_controller(provider, model)
-        summary = llm_model.get_summary(messages_to_summarize)
+        summary = await llm_model.get_summary(messages_to_summarize)
     except Exception as e:
         raise AgentError("Failed to call LLM to summarize conversation") from e
 
@@ -32,6 +39,75 @@ async def prepare_summary(messages: list[Any], state: dict[str, Any]) -> str:
         return summary.content[-1]["text"]
 
 
+class BackgroundSummarizer:
+    """
+    Summaries of chats computed in the background, keyed by chat_id. A summary started during
+    one turn is applied by the history manager on the next turn of the chat, so summarization
+    does not add to the response time. Summaries not applied within the timeout are discarded.
+
+    Attributes:
+        enabled (bool): Whether background mode is enabled, set with HISTORY_SUMMARY_MODE variable.
+        timeout (float): Number of seconds after which an unapplied summary is discarded.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("HISTORY_SUMMARY_MODE", "inline") == "background"
+        self.timeout = float(os.getenv("HISTORY_SUMMARY_TIMEOUT", 3600))
+        self._summaries: dict[
+            str, tuple[asyncio.Task, list[Any], asyncio.TimerHandle]
+        ] = {}
+
+    def start(self, chat_id: str, messages: list[Any], state: dict[str, Any]) -> None:
+        if chat_id in self._summaries:
+            return
+        # Started in an empty context, so the task is detached from callbacks of the graph run
+        task = asyncio.create_task(
+            prepare_summary(messages, state), context=contextvars.Context()
+        )
+        timer = asyncio.get_running_loop().call_later(
+            self.timeout, self._expire, chat_id, task
+        )
+        self._summaries[chat_id] = (task, messages, timer)
+
+    def take(self, chat_id: str) -> Optional[tuple[str, list[Any]]]:
+        """
+        Take the summary of the chat if it is ready.
+
+        Args:
+            chat_id (str): The ID of the chat.
+
+        Returns:
+            Optional[tuple[str, list[Any]]]: The summary and the summarized messages, None if there
+            is no summary or it is still being computed.
+        """
+        entry = self._summaries.get(chat_id)
+        if entry is None or not entry[0].done():
+            return None
+        task, messages, timer = self._summaries.pop(chat_id)
+        timer.cancel()
+        if task.cancelled():
+            return None
+        if task.exception() is not None:
+            logger.error(f"Failed to summarize chat {chat_id}: {task.exception()}")
+            return None
+        return task.result(), messages
+
+    def discard(self, chat_id: str) -> None:
+        entry = self._summaries.pop(chat_id, None)
+        if entry is not None:
+            entry[0].cancel()
+            entry[2].cancel()
+
+    def _expire(self, chat_id: str, task: asyncio.Task) -> None:
+        # A newer summary of the chat may have been started after this one was taken
+        entry = self._summaries.get(chat_id)
+        if entry is not None and entry[0] is task:
+            self.discard(chat_id)
+
+
+summarizer = BackgroundSummarizer()
+
+
 def clear_message_history(messages: list[Any]) -> tuple[list[Any], list[Any]]:
     messages = messages[:-1]
     messages_to_delete = []
@@ -44,12 +120,38 @@ def clear_message_history(messages: list[Any]) -> tuple[list[Any], list[Any]]:
     return messages_to_delete, messages_to_summarize
 
 
-def history_manager(state: GraphState) -> GraphState:
+def apply_background_summary(
+    state: GraphState, config: RunnableConfig
+) -> Optional[GraphState]:
+    """
+    Apply the summary computed in the background during a previous turn, removing the summarized
+    messages still present in the history.
+
+    Returns:
+        Optional[GraphState]: The state update or None if no summary is ready.
+    """
+    ready = summarizer.take(config["configurable"].get("chat_id"))
+    if ready is None:
+        return None
+    summary, summarized_messages = ready
+    present_ids = {message.id for message in state["messages"]}
+    return {
+        "messages": [
+            RemoveMessage(id=message.id)
+            for message in summarized_messages
+            if message.id in present_ids
+        ],
+        "conversation_summary": summary,
+    }
+
+
+async def history_manager(state: GraphState, config: RunnableConfig) -> GraphState:
     messages = state["messages"]
     history_config = state["history_config"]
 
     new_messages = []
     messages_to_summarize = []
+    history_token_count = state["history_token_count"]
 
     match history_config["management_type"]:
         case HistoryManagementType.KEEP_N_MESSAGES.value:
@@ -66,19 +168,19 @@ def history_manager(state: GraphState) -> GraphState:
                     new_messages.append(RemoveMessage(id=messages[i].id))
 
         case HistoryManagementType.KEEP_N_TOKENS.value:
-            if state["history_token_count"] > history_config["number_of_tokens"]:
-                new_messages.append(RemoveMessage(id=messages[0].id))
-                i = 1
-                while messages[i].type != "human" and i < len(messages):
-                    new_messages.append(RemoveMessage(id=messages[i].id))
-                    i += 1
+            cut, history_token_count = find_token_cut(
+                messages, history_config["number_of_tokens"]
+            )
+            for i in range(0, cut):
+                new_messages.append(RemoveMessage(id=messages[i].id))
 
         case HistoryManagementType.SUMMARIZE_N_MESSAGES.value:
             if len(messages) > history_config["number_of_messages"]:
                 new_messages, messages_to_summarize = clear_message_history(messages)
 
         case HistoryManagementType.SUMMARIZE_N_TOKENS.value:
-            if state["history_token_count"] > history_config["number_of_tokens"]:
+            history_token_count = count_tokens(messages)
+            if history_token_count > history_config["number_of_tokens"]:
                 new_messages, messages_to_summarize = clear_message_history(messages)
 
         case HistoryManagementType.NONE.value:
@@ -88,11 +190,25 @@ def history_manager(state: GraphState) -> GraphState:
             logger.error(f"Invalid history type {history_config['type']}")
             raise ValueError(f"Invalid history type {history_config['type']}")
 
+    if summarizer.enabled and history_config["management_type"] in (
+        HistoryManagementType.SUMMARIZE_N_MESSAGES.value,
+        HistoryManagementType.SUMMARIZE_N_TOKENS.value,
+    ):
+        update = apply_background_summary(state, config)
+        if update is not None:
+            return update
+        if messages_to_summarize:
+            summarizer.start(
+                config["configurable"].get("chat_id"), messages_to_summarize, state
+            )
+        return {"messages": [], "history_token_count": history_token_count}
+
     if messages_to_summarize:
-        summary = asyncio.run(prepare_summary(messages_to_summarize, state))
+        summary = await prepare_summary(messages_to_summarize, state)
         return {
             "messages": new_messages,
             "conversation_summary": summary,
+            "history_token_count": count_tokens(messages[-1:]),
         }
 
-    return {"messages": new_messages}
+    return {"messages": new_messages, "history_token_count": history_token_count}
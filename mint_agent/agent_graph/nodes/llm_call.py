@@ -11,7 +11,7 @@ async def llm_call(state):
 
     model_name = state["model_name"]
     provider = state["provider"]
-    tools = ToolController.get_tools()
+    tools = ToolController.select_tools(messages, state["tools"])
 
     if conversation_summary is not None:
         system_prompt = f"{state["system_prompt"]} This is summary of our conversation so far: {conversation_summary}"
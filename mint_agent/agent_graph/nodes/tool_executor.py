@@ -0,0 +1,173 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from loguru import logger
+
+
+def get_pending_tool_calls(messages: list) -> list[ToolCall]:
+    """
+    Get tool calls of the last AI message that have no tool message with the result yet.
+
+    Args:
+        messages (list): Messages of the conversation.
+
+    Returns:
+        list[ToolCall]: The pending tool calls.
+    """
+    answered = set()
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            answered.add(message.tool_call_id)
+        elif isinstance(message, AIMessage):
+            return [call for call in message.tool_calls if call["id"] not in answered]
+        else:
+            return []
+    return []
+
+
+def get_approved_tool_calls(state: dict) -> list[ToolCall]:
+    """
+    Get pending tool calls that can be executed: all of them if the user accepted the tools,
+    otherwise only calls of safe tools.
+
+    Args:
+        state (dict): The graph state.
+
+    Returns:
+        list[ToolCall]: The approved tool calls.
+    """
+    pending = get_pending_tool_calls(state["messages"])
+    if state["tool_accept"]:
+        return pending
+    return [call for call in pending if call["name"] in state["safe_tools"]]
+
+
+class ToolPrefetcher:
+    """
+    Speculative executions of tool calls awaiting the user's acceptance, keyed by (chat_id, tool_call_id).
+    Executions not taken within the timeout are cancelled.
+
+    Attributes:
+        enabled (bool): Whether prefetching is enabled, set with TOOL_PREFETCH variable.
+        timeout (float): Number of seconds after which a prefetched result is discarded.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("TOOL_PREFETCH", "FALSE") == "TRUE"
+        self.timeout = float(os.getenv("TOOL_PREFETCH_TIMEOUT", 60))
+        self._tasks: dict[tuple[str, str], asyncio.Task] = {}
+
+    def start(
+        self, chat_id: str, call_id: str, run: Callable[[], Awaitable[ToolMessage]]
+    ) -> None:
+        key = (chat_id, call_id)
+        if key in self._tasks:
+            return
+        self._tasks[key] = asyncio.create_task(run())
+        asyncio.get_running_loop().call_later(
+            self.timeout, self.discard, chat_id, call_id
+        )
+
+    def take(self, chat_id: str, call_id: str) -> Optional[asyncio.Task]:
+        return self._tasks.pop((chat_id, call_id), None)
+
+    def discard(self, chat_id: str, call_id: str) -> None:
+        task = self._tasks.pop((chat_id, call_id), None)
+        if task is not None:
+            task.cancel()
+
+
+prefetcher = ToolPrefetcher()
+
+
+class ToolExecutor(ToolNode):
+    """
+    Tool node executing approved pending tool calls concurrently, at most max_concurrency at once.
+    Calls waiting for the user's acceptance are left pending, calls of read-only tools among them
+    can be started speculatively with prefetch and their results are used once accepted.
+    Prefetched calls run without the run callbacks, so 'prefetched_tool_start' and
+    'prefetched_tool_end' custom events are dispatched in place of tool events when their
+    results are used.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        *,
+        name: str = "tools",
+        max_concurrency: Optional[int] = None,
+        read_only_tools: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(tools, name=name)
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("TOOL_CONCURRENCY_LIMIT", 4)
+        )
+        self.read_only_tools = set(read_only_tools or [])
+
+    def prefetch(self, tool_calls: list[ToolCall], config: RunnableConfig) -> None:
+        """
+        Start read-only tool calls awaiting acceptance in the background, if prefetching is enabled.
+
+        Args:
+            tool_calls (list[ToolCall]): Tool calls awaiting acceptance.
+            config (RunnableConfig): Config of the graph run.
+        """
+        if not prefetcher.enabled:
+            return
+        chat_id = config["configurable"].get("chat_id")
+        # Detached from the run callbacks, as the run ends before the result is used
+        detached_config = {"configurable": config["configurable"]}
+        for call in tool_calls:
+            if call["name"] in self.read_only_tools:
+                logger.debug(f"Prefetching tool call {call['id']} ({call['name']})")
+                prefetcher.start(
+                    chat_id,
+                    call["id"],
+                    lambda call=call: super(ToolExecutor, self)._arun_one(
+                        call, detached_config
+                    ),
+                )
+
+    def _parse_input(self, input: dict[str, Any]) -> tuple[list[ToolCall], str]:
+        tool_calls = [
+            self._inject_state(call, input) for call in get_approved_tool_calls(input)
+        ]
+        return tool_calls, "dict"
+
+    async def _afunc(self, input: dict[str, Any], config: RunnableConfig) -> Any:
+        tool_calls, _ = self._parse_input(input)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(call: ToolCall) -> ToolMessage:
+            async with semaphore:
+                return await self._arun_one(call, config)
+
+        outputs = await asyncio.gather(*(run_one(call) for call in tool_calls))
+        return {"messages": outputs}
+
+    async def _arun_one(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        task = prefetcher.take(config["configurable"].get("chat_id"), call["id"])
+        if task is not None and not task.cancelled():
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            else:
+                # Dispatched once the result is there, a cancelled prefetch is run again as a usual call
+                await adispatch_custom_event(
+                    "prefetched_tool_start",
+                    {"tool": call["name"], "input": call["args"]},
+                    config=config,
+                )
+                await adispatch_custom_event(
+                    "prefetched_tool_end", {"tool": call["name"]}, config=config
+                )
+                return result
+        return await super()._arun_one(call, config)
@@ -1,19 +1,35 @@
+from typing import Callable, Optional
+
 from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
 
+from mint_agent.agent_graph.nodes.tool_executor import get_pending_tool_calls
 
-async def tool_permit(state):
-    tool_to_use = state["messages"][-1].tool_calls[0]
-    tool_name = tool_to_use["name"]
-    tool_input = tool_to_use["args"]
 
-    new_state = state.copy()
+async def tool_permit(
+    state, config: RunnableConfig, prefetch: Optional[Callable] = None
+):
+    pending_calls = get_pending_tool_calls(state["messages"])
+    unsafe_calls = [
+        call for call in pending_calls if call["name"] not in state["safe_tools"]
+    ]
 
-    if tool_name not in state["safe_tools"]:
-        new_state["tool_accept"] = 0
+    if unsafe_calls:
+        if prefetch is not None:
+            prefetch(unsafe_calls, config)
+        # One request for all calls, tool and params of the first one are kept for older clients,
+        # tool_count tells them that confirming accepts more calls than the one shown
         await adispatch_custom_event(
-            "tool_accept", {"tool": tool_name, "params": tool_input}
+            "tool_accept",
+            {
+                "tool": unsafe_calls[0]["name"],
+                "params": unsafe_calls[0]["args"],
+                "tool_count": len(unsafe_calls),
+                "tool_calls": [
+                    {"id": call["id"], "tool": call["name"], "params": call["args"]}
+                    for call in unsafe_calls
+                ],
+            },
         )
-    else:
-        new_state["tool_accept"] = 1
 
-    return new_state
+    return {"tool_accept": not unsafe_calls}
@@ -1,9 +1,17 @@
-import pickle
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import uuid
+import weakref
 from contextlib import AbstractContextManager
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from enum import Enum
 from types import TracebackType
-from typing import AsyncIterator, Optional, Sequence
+from typing import AsyncIterator, Awaitable, Optional, Sequence
 
+from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.base import (
     BaseCheckpointSaver,
@@ -11,19 +19,148 @@ from langgraph.checkpoint.base import (
     Checkpoint,
     CheckpointMetadata,
     CheckpointTuple,
+    WRITES_IDX_MAP,
     SerializerProtocol,
 )
-from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.serde.types import ChannelProtocol
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
 from typing_extensions import Self
 
+from mint_agent.database.serde import JsonPlusSerializerCompat, get_checkpoint_serde
+from mint_agent.utils.cache import TTLCache
+from mint_agent.utils.errors import CheckpointError
 
-class JsonPlusSerializerCompat(JsonPlusSerializer):
-    def loads(self, data: bytes) -> any:
-        if data.startswith(b"\x80") and data.endswith(b"."):
-            return pickle.loads(data)
-        return super().loads(data)
+_async_client: Optional[AsyncIOMotorClient] = None
+_sync_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+# Checkpoints stored without channel values, which are kept in '{user_id}_chat_blobs'
+DELTA_FORMAT = "delta"
+# Placeholder of a message list replaced with a slice of the blob's message_refs
+MESSAGE_REFS = "__message_refs__"
+# Unreferenced blobs and messages younger than this may belong to a checkpoint being written
+GC_GRACE_SECONDS = 300
+# Raw usage documents not rolled up this long after they were claimed are rolled up again
+ROLLUP_RETRY_SECONDS = 300
+
+
+def _client_options() -> dict:
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+    }
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """
+    Returns the process-wide asynchronous MongoDB client, creating it on first use.
+
+    Returns:
+        AsyncIOMotorClient: The shared client.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncIOMotorClient(
+                os.getenv("MONGO_URI"), **_client_options()
+            )
+        return _async_client
+
+
+def get_sync_client() -> MongoClient:
+    """
+    Returns the process-wide synchronous MongoDB client, creating it on first use.
+
+    Returns:
+        MongoClient: The shared client.
+    """
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None:
+            _sync_client = MongoClient(os.getenv("MONGO_URI"), **_client_options())
+        return _sync_client
+
+
+def get_db_name() -> str:
+    return os.getenv("MONGO_DB_NAME")
+
+
+def close_clients() -> None:
+    """
+    Closes the shared MongoDB clients, to be called on application shutdown.
+    """
+    global _async_client, _sync_client
+    with _client_lock:
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+class CheckpointRetentionType(Enum):
+    """
+    Enum representing checkpoint retention policies. The latest checkpoint (head) of a chat is always kept.
+
+    Attributes:
+        KEEP_ALL: Never delete checkpoints.
+        KEEP_LAST_N: Keep only the given number of the latest checkpoints of each chat.
+        MAX_AGE: Delete checkpoints older than the given number of hours.
+        HEAD_ONLY: Keep only the latest checkpoint of each chat.
+    """
+
+    KEEP_ALL = "keep_all"
+    KEEP_LAST_N = "keep_last_n"
+    MAX_AGE = "max_age"
+    HEAD_ONLY = "head_only"
+
+
+class CheckpointRetention:
+    """
+    Configuration of the checkpoint retention policy.
+
+    Attributes:
+        retention_type (CheckpointRetentionType): The retention policy.
+        number_of_checkpoints (int): Number of checkpoints kept per chat for KEEP_LAST_N.
+        max_age_hours (float): Age after which checkpoints are deleted for MAX_AGE.
+        compaction_interval (int): Number of checkpoints written to a chat between compactions.
+    """
+
+    def __init__(
+        self,
+        retention_type: CheckpointRetentionType = CheckpointRetentionType.KEEP_ALL,
+        number_of_checkpoints: int = 20,
+        max_age_hours: float = 168,
+        compaction_interval: int = 10,
+    ) -> None:
+        if number_of_checkpoints < 1:
+            raise ValueError("number_of_checkpoints must be a positive integer")
+        if compaction_interval < 1:
+            raise ValueError("compaction_interval must be a positive integer")
+        self.retention_type = retention_type
+        self.number_of_checkpoints = number_of_checkpoints
+        self.max_age_hours = max_age_hours
+        self.compaction_interval = compaction_interval
+
+    @classmethod
+    def from_env(cls) -> "CheckpointRetention":
+        """
+        Create retention configuration from CHECKPOINT_RETENTION* environment variables.
+
+        Returns:
+            CheckpointRetention: The retention configuration.
+        """
+        return cls(
+            retention_type=CheckpointRetentionType(
+                os.getenv("CHECKPOINT_RETENTION", "keep_all")
+            ),
+            number_of_checkpoints=int(os.getenv("CHECKPOINT_RETENTION_COUNT", 20)),
+            max_age_hours=float(os.getenv("CHECKPOINT_RETENTION_MAX_AGE_HOURS", 168)),
+            compaction_interval=int(os.getenv("CHECKPOINT_COMPACTION_INTERVAL", 10)),
+        )
 
 
 class MongoDBBase:
@@ -43,23 +180,497 @@ class MongoDBBase:
         self.collection = client[db_name][collection_name]
 
 
-class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoDBBase):
+class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager):
+    """
+    Checkpoint saver storing checkpoints of every user in a separate '{user_id}_chats' collection.
+    The collection is resolved from config["configurable"]["user_id"] on each call, so a single
+    saver (and a single compiled graph) serves all users.
+
+    Checkpoints are delta-encoded: the checkpoint document holds channel versions only, while
+    channel values are stored once per (chat_id, channel, version) in '{user_id}_chat_blobs',
+    written only for channels updated since the parent checkpoint. Lists of messages inside
+    channel values are replaced with (message_id, digest) references to '{user_id}_chat_messages',
+    so every message is stored once. Writes of finished tasks are kept in '{user_id}_chat_writes'
+    and returned as pending writes of their checkpoint. Checkpoints without the 'format' field are stored whole
+    and still readable.
+
+    Old checkpoints are removed according to the retention policy by background compaction,
+    started every retention.compaction_interval checkpoints written to a chat. Compaction also
+    removes blobs, messages and writes no longer referenced by any checkpoint.
+    """
+
     serde = JsonPlusSerializerCompat()
+    gc_grace_seconds: float = GC_GRACE_SECONDS
 
     client: AsyncIOMotorClient
     db_name: str
-    collection_name: str
 
     def __init__(
         self,
         client: AsyncIOMotorClient,
         db_name: str,
-        user: str,
         *,
         serde: Optional[SerializerProtocol] = None,
+        retention: Optional[CheckpointRetention] = None,
+    ) -> None:
+        super().__init__(serde=serde or get_checkpoint_serde())
+        self.client = client
+        self.db_name = db_name
+        self.db = client[db_name]
+        self.retention = retention or CheckpointRetention.from_env()
+        self._indexed_collections: set[str] = set()
+        # Checkpoints written since the last compaction, keyed by (collection name, chat_id)
+        self._puts_since_compaction = TTLCache(max_size=10000, ttl=3600)
+        self._compacting_chats: set[tuple[str, str]] = set()
+        self._compaction_tasks: set[asyncio.Task] = set()
+        # Messages known to be stored, keyed by (collection name, chat_id, message_id, digest)
+        self._stored_messages = TTLCache(max_size=10000, ttl=3600)
+        # Chats whose latest checkpoint is known to be delta-encoded
+        self._delta_chats = TTLCache(max_size=10000, ttl=3600)
+
+    async def _collection(self, config: RunnableConfig) -> AsyncIOMotorCollection:
+        user_id = config["configurable"]["user_id"]
+        collection = self.db[f"{user_id}_chats"]
+        if collection.name not in self._indexed_collections:
+            await self._ensure_collection_indexes(collection)
+        return collection
+
+    def _companions(
+        self, collection: AsyncIOMotorCollection
+    ) -> tuple[AsyncIOMotorCollection, AsyncIOMotorCollection]:
+        prefix = collection.name.removesuffix("_chats")
+        return self.db[f"{prefix}_chat_blobs"], self.db[f"{prefix}_chat_messages"]
+
+    def _writes(self, collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+        return self.db[f"{collection.name.removesuffix('_chats')}_chat_writes"]
+
+    async def _ensure_collection_indexes(
+        self, collection: AsyncIOMotorCollection
+    ) -> None:
+        self._indexed_collections.add(collection.name)
+        blobs, messages = self._companions(collection)
+        try:
+            await collection.create_index(
+                [("chat_id", ASCENDING), ("checkpoint_id", DESCENDING)],
+                name="chat_id_checkpoint_id",
+            )
+            await blobs.create_index(
+                [("chat_id", ASCENDING), ("channel", ASCENDING), ("version", ASCENDING)],
+                name="chat_id_channel_version",
+                unique=True,
+            )
+            await messages.create_index(
+                [
+                    ("chat_id", ASCENDING),
+                    ("message_id", ASCENDING),
+                    ("digest", ASCENDING),
+                ],
+                name="chat_id_message_id_digest",
+                unique=True,
+            )
+            await self._writes(collection).create_index(
+                [
+                    ("chat_id", ASCENDING),
+                    ("checkpoint_id", ASCENDING),
+                    ("task_id", ASCENDING),
+                    ("idx", ASCENDING),
+                ],
+                name="chat_id_checkpoint_id_task_id_idx",
+                unique=True,
+            )
+        except Exception as e:
+            self._indexed_collections.discard(collection.name)
+            logger.error(f"Error while creating indexes for {collection.name}: {e}")
+
+    async def ensure_indexes(self) -> None:
+        """
+        Create missing indexes on all existing checkpoint collections, meant to be run on startup.
+        """
+        try:
+            collection_names = await self.db.list_collection_names()
+        except Exception as e:
+            logger.error(f"Error while listing checkpoint collections: {e}")
+            return
+        for collection_name in collection_names:
+            if collection_name.endswith("_chats"):
+                await self._ensure_collection_indexes(self.db[collection_name])
+
+    async def compact(self, config: RunnableConfig) -> int:
+        """
+        Delete checkpoints of the chat that are not kept by the retention policy.
+
+        Args:
+            config (RunnableConfig): Config with user_id and chat_id of the chat.
+
+        Returns:
+            int: Number of deleted checkpoints.
+        """
+        collection = await self._collection(config)
+        return await self._compact_chat(collection, config["configurable"]["chat_id"])
+
+    async def compact_all(self) -> int:
+        """
+        Compact all chats of all users, so that retention also applies to inactive chats.
+
+        Returns:
+            int: Number of deleted checkpoints.
+        """
+        if self.retention.retention_type == CheckpointRetentionType.KEEP_ALL:
+            return 0
+        deleted = 0
+        try:
+            collection_names = await self.db.list_collection_names()
+            for collection_name in collection_names:
+                if not collection_name.endswith("_chats"):
+                    continue
+                collection = self.db[collection_name]
+                for chat_id in await collection.distinct("chat_id"):
+                    deleted += await self._compact_chat(collection, chat_id)
+        except Exception as e:
+            logger.error(f"Error while compacting checkpoints: {e}")
+        logger.debug(f"Checkpoint compaction removed {deleted} checkpoints")
+        return deleted
+
+    def start_compaction(self) -> None:
+        """
+        Run compaction of all chats in the background, meant to be run on startup.
+        """
+        self._run_in_background(self.compact_all())
+
+    async def stop_compaction(self) -> None:
+        """
+        Cancel running background compactions, meant to be run on shutdown.
+        Compaction only deletes documents, so it is safe to interrupt and repeat.
+        """
+        for task in self._compaction_tasks:
+            task.cancel()
+        await asyncio.gather(*self._compaction_tasks, return_exceptions=True)
+
+    def _schedule_compaction(
+        self, collection: AsyncIOMotorCollection, chat_id: str
+    ) -> None:
+        if self.retention.retention_type == CheckpointRetentionType.KEEP_ALL:
+            return
+        key = (collection.name, chat_id)
+        puts = (self._puts_since_compaction.pop(key) or 0) + 1
+        if puts < self.retention.compaction_interval or key in self._compacting_chats:
+            self._puts_since_compaction.set(key, puts)
+            return
+
+        async def compact_chat() -> None:
+            try:
+                await self._compact_chat(collection, chat_id)
+            finally:
+                self._compacting_chats.discard(key)
+
+        self._compacting_chats.add(key)
+        self._run_in_background(compact_chat())
+
+    def _run_in_background(self, coroutine: Awaitable) -> None:
+        task = asyncio.create_task(coroutine)
+        self._compaction_tasks.add(task)
+        task.add_done_callback(self._compaction_tasks.discard)
+
+    async def _compact_chat(
+        self, collection: AsyncIOMotorCollection, chat_id: str
+    ) -> int:
+        query = {"chat_id": chat_id}
+        latest = collection.find(query, projection={"checkpoint_id": 1}).sort(
+            "checkpoint_id", -1
+        )
+        try:
+            match self.retention.retention_type:
+                case CheckpointRetentionType.KEEP_LAST_N | CheckpointRetentionType.HEAD_ONLY:
+                    keep = (
+                        self.retention.number_of_checkpoints
+                        if self.retention.retention_type
+                        == CheckpointRetentionType.KEEP_LAST_N
+                        else 1
+                    )
+                    oldest_kept = await latest.skip(keep - 1).limit(1).to_list(1)
+                    if not oldest_kept:
+                        return 0
+                    query["checkpoint_id"] = {"$lt": oldest_kept[0]["checkpoint_id"]}
+                case CheckpointRetentionType.MAX_AGE:
+                    head = await latest.limit(1).to_list(1)
+                    if not head:
+                        return 0
+                    query["checkpoint_id"] = {"$lt": head[0]["checkpoint_id"]}
+                    query["created_at"] = {
+                        "$lt": datetime.now()
+                        - timedelta(hours=self.retention.max_age_hours)
+                    }
+                case _:
+                    return 0
+
+            result = await collection.delete_many(query)
+            if result.deleted_count:
+                await self._collect_garbage(collection, chat_id)
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"Error while compacting checkpoints of chat {chat_id}: {e}")
+            return 0
+
+    async def _collect_garbage(
+        self, collection: AsyncIOMotorCollection, chat_id: str
+    ) -> None:
+        blobs, messages = self._companions(collection)
+        cutoff = datetime.now() - timedelta(seconds=self.gc_grace_seconds)
+
+        used_versions = set()
+        async for doc in collection.find(
+            {"chat_id": chat_id, "format": DELTA_FORMAT}, projection={"checkpoint": 1}
+        ):
+            checkpoint = self.serde.loads(doc["checkpoint"])
+            used_versions.update(
+                (channel, str(version))
+                for channel, version in checkpoint["channel_versions"].items()
+            )
+
+        unused_blobs = []
+        used_messages = set()
+        async for blob in blobs.find(
+            {"chat_id": chat_id},
+            projection={"channel": 1, "version": 1, "message_refs": 1, "created_at": 1},
+        ):
+            if (blob["channel"], blob["version"]) in used_versions or blob[
+                "created_at"
+            ] >= cutoff:
+                used_messages.update(tuple(ref) for ref in blob["message_refs"])
+            else:
+                unused_blobs.append(blob["_id"])
+
+        unused_messages = [
+            message["_id"]
+            async for message in messages.find(
+                {"chat_id": chat_id, "created_at": {"$lt": cutoff}},
+                projection={"message_id": 1, "digest": 1},
+            )
+            if (message["message_id"], message["digest"]) not in used_messages
+        ]
+
+        await self._writes(collection).delete_many(
+            {
+                "chat_id": chat_id,
+                "checkpoint_id": {
+                    "$nin": await collection.distinct("checkpoint_id", {"chat_id": chat_id})
+                },
+                "created_at": {"$lt": cutoff},
+            }
+        )
+        if unused_blobs:
+            await blobs.delete_many({"_id": {"$in": unused_blobs}})
+        if unused_messages:
+            await messages.delete_many({"_id": {"$in": unused_messages}})
+        self._stored_messages.invalidate(
+            lambda key: key[0] == collection.name and key[1] == chat_id
+        )
+
+    async def _load_checkpoint_tuple(
+        self, collection: AsyncIOMotorCollection, doc: dict, user_id: str
+    ) -> CheckpointTuple:
+        checkpoint = self.serde.loads(doc["checkpoint"])
+        if doc.get("format") == DELTA_FORMAT:
+            checkpoint["channel_values"] = await self._load_channel_values(
+                collection, doc["chat_id"], checkpoint["channel_versions"]
+            )
+
+        writes = self._writes(collection).find(
+            {"chat_id": doc["chat_id"], "checkpoint_id": doc["checkpoint_id"]}
+        )
+        pending_writes = [
+            (
+                write["task_id"],
+                write["channel"],
+                self.serde.loads_typed((write["type"], write["value"])),
+            )
+            async for write in writes.sort([("task_id", ASCENDING), ("idx", ASCENDING)])
+        ]
+
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "chat_id": doc["chat_id"],
+                    "checkpoint_id": doc["checkpoint_id"],
+                    "user_id": user_id,
+                }
+            },
+            checkpoint,
+            self.serde.loads(doc["metadata"]),
+            (
+                {
+                    "configurable": {
+                        "chat_id": doc["chat_id"],
+                        "checkpoint_id": doc["parent_checkpoint_id"],
+                        "user_id": user_id,
+                    }
+                }
+                if doc.get("parent_checkpoint_id")
+                else None
+            ),
+            pending_writes,
+        )
+
+    async def _load_channel_values(
+        self,
+        collection: AsyncIOMotorCollection,
+        chat_id: str,
+        channel_versions: ChannelVersions,
+    ) -> dict[str, any]:
+        if not channel_versions:
+            return {}
+        blobs, messages = self._companions(collection)
+
+        blob_docs = await blobs.find(
+            {
+                "chat_id": chat_id,
+                "$or": [
+                    {"channel": channel, "version": str(version)}
+                    for channel, version in channel_versions.items()
+                ],
+            }
+        ).to_list(None)
+
+        refs = {tuple(ref) for blob in blob_docs for ref in blob["message_refs"]}
+        stored_messages = {}
+        if refs:
+            async for message in messages.find(
+                {
+                    "chat_id": chat_id,
+                    "message_id": {"$in": list({message_id for message_id, _ in refs})},
+                }
+            ):
+                key = (message["message_id"], message["digest"])
+                if key in refs:
+                    stored_messages[key] = self.serde.loads_typed(
+                        (message["type"], message["message"])
+                    )
+
+        return {
+            blob["channel"]: _resolve_message_refs(
+                self.serde.loads_typed((blob["type"], blob["blob"])),
+                blob["message_refs"],
+                stored_messages,
+            )
+            for blob in blob_docs
+        }
+
+    async def _has_delta_parent(
+        self,
+        collection: AsyncIOMotorCollection,
+        chat_id: str,
+        parent_checkpoint_id: Optional[str],
+    ) -> bool:
+        if not parent_checkpoint_id or self._delta_chats.get((collection.name, chat_id)):
+            return True
+        parent = await collection.find_one(
+            {"chat_id": chat_id, "checkpoint_id": parent_checkpoint_id},
+            projection={"format": 1},
+        )
+        return parent is not None and parent.get("format") == DELTA_FORMAT
+
+    async def _put_channel_values(
+        self,
+        collection: AsyncIOMotorCollection,
+        chat_id: str,
+        checkpoint: Checkpoint,
+        new_versions: ChannelVersions,
     ) -> None:
-        super().__init__(serde=serde)
-        MongoDBBase.__init__(self, client, db_name, f"{user}_chats")
+        blobs, messages = self._companions(collection)
+        now = datetime.now()
+
+        blob_writes = []
+        new_messages = {}
+        for channel, version in new_versions.items():
+            if channel not in checkpoint["channel_values"]:
+                continue
+            refs = []
+            value = self._replace_messages(
+                checkpoint["channel_values"][channel], refs, new_messages
+            )
+            type_, blob = self.serde.dumps_typed(value)
+            blob_writes.append(
+                UpdateOne(
+                    {"chat_id": chat_id, "channel": channel, "version": str(version)},
+                    {
+                        "$setOnInsert": {
+                            "type": type_,
+                            "blob": blob,
+                            "message_refs": refs,
+                            "created_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+
+        message_keys = []
+        message_writes = []
+        for (message_id, digest), (type_, data) in new_messages.items():
+            key = (collection.name, chat_id, message_id, digest)
+            if self._stored_messages.get(key):
+                continue
+            message_keys.append(key)
+            message_writes.append(
+                UpdateOne(
+                    {"chat_id": chat_id, "message_id": message_id, "digest": digest},
+                    {"$setOnInsert": {"type": type_, "message": data, "created_at": now}},
+                    upsert=True,
+                )
+            )
+
+        # Messages and blobs are written before the checkpoint referencing them
+        if message_writes:
+            await messages.bulk_write(message_writes, ordered=False)
+            for key in message_keys:
+                self._stored_messages.set(key, True)
+        if blob_writes:
+            await blobs.bulk_write(blob_writes, ordered=False)
+
+    def _replace_messages(
+        self, value: any, refs: list, new_messages: dict[tuple[str, str], tuple]
+    ) -> any:
+        """
+        Replace lists of messages in the value, or directly in its dict values, with placeholders
+        pointing to a slice of refs. Serialized messages are collected in new_messages.
+        """
+        if _is_message_list(value):
+            start = len(refs)
+            for message in value:
+                type_, data = self.serde.dumps_typed(message)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                refs.append([message.id, digest])
+                new_messages[(message.id, digest)] = (type_, data)
+            return {MESSAGE_REFS: [start, len(refs)]}
+        if isinstance(value, dict):
+            return {
+                key: (
+                    self._replace_messages(item, refs, new_messages)
+                    if _is_message_list(item)
+                    else item
+                )
+                for key, item in value.items()
+            }
+        return value
+
+    def get_next_version(
+        self, current: Optional[float], channel: ChannelProtocol
+    ) -> float:
+        """
+        Get the next version of a channel: the counter incremented by one with a random fraction,
+        so chats forked from an older checkpoint or written by two sessions never store different
+        values under the same (channel, version) blob. Versions are floats rather than strings,
+        so they still compare with integer versions of checkpoints written before.
+
+        Args:
+            current (Optional[float]): The current version of the channel.
+            channel (ChannelProtocol): The channel.
+
+        Returns:
+            float: The next version.
+        """
+        counter = int(current) if current is not None else 0
+        return counter + 1 + random.random()
 
     def __enter__(self) -> Self:
         return self
@@ -83,34 +694,19 @@ class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoD
             base_query["checkpoint_id"] = checkpoint_id
 
         try:
-            result = self.collection.find(base_query).sort("checkpoint_id", -1).limit(1)
+            collection = await self._collection(config)
+            result = collection.find(base_query).sort("checkpoint_id", -1).limit(1)
 
             if await result.fetch_next:
                 last_checkpoint = await result.next()
             else:
                 return None
 
-            return CheckpointTuple(
-                {
-                    "configurable": {
-                        "chat_id": chat_id,
-                        "checkpoint_id": last_checkpoint["checkpoint_id"],
-                        "user_id": user_id,
-                    }
-                },
-                self.serde.loads(last_checkpoint["checkpoint"]),
-                self.serde.loads(last_checkpoint["metadata"]),
-                (
-                    {
-                        "configurable": {
-                            "chat_id": chat_id,
-                            "checkpoint_id": last_checkpoint["parent_checkpoint_id"],
-                        }
-                    }
-                    if last_checkpoint.get("parent_checkpoint_id")
-                    else None
-                ),
+            return await self._load_checkpoint_tuple(
+                collection, last_checkpoint, user_id
             )
+        except CheckpointError:
+            raise
         except Exception as e:
             logger.error(f"Error in aget_tuple function: {e}")
 
@@ -118,50 +714,34 @@ class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoD
         self,
         config: Optional[RunnableConfig],
         *,
-        filters: Optional[dict[str, any]] = None,
+        filter: Optional[dict[str, any]] = None,
         before: Optional[RunnableConfig] = None,
         limit: Optional[int] = None,
     ) -> AsyncIterator[CheckpointTuple]:
-        query = {}
-        if config is not None:
-            query["chat_id"] = config["configurable"]["chat_id"]
+        if config is None:
+            raise ValueError("config with user_id is required to list checkpoints")
 
-        if filters:
-            for key, value in filters.items():
+        query = {"chat_id": config["configurable"]["chat_id"]}
+        user_id = config["configurable"]["user_id"]
+
+        if filter:
+            for key, value in filter.items():
                 query[f"metadata.{key}"] = value
 
         if before is not None:
             query["checkpoint_id"] = {"$lt": before["configurable"]["checkpoint_id"]}
 
-        result = self.collection.find(query).sort("checkpoint_id", -1)
+        collection = await self._collection(config)
+        result = collection.find(query).sort("checkpoint_id", -1)
 
         if limit:
             result = result.limit(limit)
 
         try:
             async for doc in result:
-                checkpoint = self.serde.loads_typed((doc["type"], doc["checkpoint"]))
-
-                parent_config = None
-                if "parent_checkpoint_id" in checkpoint:
-                    parent_config = {
-                        "configurable": {
-                            "chat_id": doc["chat_id"],
-                            "checkpoint_id": checkpoint["parent_checkpoint_id"],
-                        }
-                    }
-
-                yield CheckpointTuple(
-                    {
-                        "configurable": {
-                            "chat_id": doc["chat_id"],
-                            "checkpoint_id": checkpoint["checkpoint_id"],
-                        }
-                    },
-                    checkpoint,
-                    self.serde.loads(checkpoint["metadata"]),
-                    parent_config,
-                )
+                yield await self._load_checkpoint_tuple(collection, doc, user_id)
+        except CheckpointError:
+            raise
         except Exception as e:
             logger.error(f"Error in alist function: {e}")
 
@@ -179,8 +759,12 @@ class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoD
         checkpoint_data = {
             "chat_id": chat_id,
             "checkpoint_id": checkpoint["id"],
-            "checkpoint": self.serde.dumps(checkpoint),
+            "format": DELTA_FORMAT,
+            "checkpoint": self.serde.dumps(
+                {key: value for key, value in checkpoint.items() if key != "channel_values"}
+            ),
             "metadata": self.serde.dumps(metadata),
+            "created_at": datetime.now(),
         }
 
         if checkpoint_id:
@@ -189,9 +773,19 @@ class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoD
         try:
             upsert_query = {"chat_id": chat_id, "checkpoint_id": checkpoint["id"]}
 
-            await self.collection.update_one(
+            collection = await self._collection(config)
+            if not await self._has_delta_parent(collection, chat_id, checkpoint_id):
+                # Unchanged channel values of a legacy parent are not stored as blobs yet
+                new_versions = {
+                    channel: checkpoint["channel_versions"][channel]
+                    for channel in checkpoint["channel_values"]
+                }
+            await self._put_channel_values(collection, chat_id, checkpoint, new_versions)
+            await collection.update_one(
                 upsert_query, {"$set": checkpoint_data}, upsert=True
             )
+            self._delta_chats.set((collection.name, chat_id), True)
+            self._schedule_compaction(collection, chat_id)
 
             return {
                 "configurable": {
@@ -209,39 +803,88 @@ class MongoDBCheckpointSaver(BaseCheckpointSaver, AbstractContextManager, MongoD
         writes: Sequence[tuple[str, any]],
         task_id: str,
     ) -> None:
-        pass
-        # TODO: Implement this function if needed, langgraph documentation is not clear on what this function should exactly do
-        # user_id = config["configurable"]["user_id"]
-        # chat_id = config["configurable"]["chat_id"]
-        # checkpoint_id = config["configurable"]["checkpoint_id"]
-
-        # try:
-        #     await self.collection.update_one(
-        #         {
-        #             "_id": user_id,
-        #             "chats.chat_id": chat_id,
-        #             "chats.checkpoints.checkpoint_id": checkpoint_id,
-        #         },
-        #         {
-        #             "$push": {
-        #                 "chats.$.checkpoints.$[checkpoint].writes": [
-        #                     {
-        #                         "task_id": task_id,
-        #                         "idx": idx,
-        #                         "channel": channel,
-        #                         "value": self.serde.dumps(value),
-        #                     }
-        #                     for idx, (channel, value) in enumerate(writes)
-        #                 ]
-        #             }
-        #         },
-        #         array_filters=[{"checkpoint.checkpoint_id": checkpoint_id}],
-        #     )
-        # except Exception as e:
-        #     logger.error(f"Error in aput_writes function: {e}")
+        """
+        Store writes of a finished task, so that the task is not run again when the step is resumed.
+        """
+        chat_id = config["configurable"]["chat_id"]
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        try:
+            collection = await self._collection(config)
+            now = datetime.now()
+            operations = []
+            for idx, (channel, value) in enumerate(writes):
+                type_, data = self.serde.dumps_typed(value)
+                operations.append(
+                    UpdateOne(
+                        {
+                            "chat_id": chat_id,
+                            "checkpoint_id": checkpoint_id,
+                            "task_id": task_id,
+                            "idx": WRITES_IDX_MAP.get(channel, idx),
+                        },
+                        {
+                            "$set": {
+                                "channel": channel,
+                                "type": type_,
+                                "value": data,
+                                "created_at": now,
+                            }
+                        },
+                        upsert=True,
+                    )
+                )
+            if operations:
+                await self._writes(collection).bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error in aput_writes function: {e}")
+
+
+def _is_message_list(value: any) -> bool:
+    return (
+        isinstance(value, list)
+        and len(value) > 0
+        and all(isinstance(item, BaseMessage) and item.id for item in value)
+    )
+
+
+def _resolve_message_refs(
+    value: any, refs: list, messages: dict[tuple[str, str], BaseMessage]
+) -> any:
+    def resolve(item: any) -> any:
+        if isinstance(item, dict) and MESSAGE_REFS in item:
+            start, end = item[MESSAGE_REFS]
+            missing = [ref for ref in refs[start:end] if tuple(ref) not in messages]
+            if missing:
+                # A partial history could keep a tool call without its result
+                raise CheckpointError(f"Missing stored messages: {missing}")
+            return [messages[tuple(ref)] for ref in refs[start:end]]
+        return item
+
+    if isinstance(value, dict) and MESSAGE_REFS not in value:
+        return {key: resolve(item) for key, item in value.items()}
+    return resolve(value)
 
 
 class MongoDBUsageTracker(MongoDBBase):
+    """
+    Tracker of token usage stored in the '{user}_tokens' collection.
+
+    Usage data is buffered in memory and written with insert_many when USAGE_FLUSH_SIZE entries
+    are collected or USAGE_FLUSH_INTERVAL seconds after the first buffered entry, so recording
+    usage never waits for the database. After a failed write the flush is retried with exponential
+    backoff, up to USAGE_FLUSH_MAX_BACKOFF seconds. Buffers are drained by close() or close_all() on shutdown.
+
+    Written usage is also added to hourly and daily rollups in the '{user}_tokens_rollup'
+    collection, which get_token_usage reads instead of scanning raw usage documents. Raw documents
+    are written with a 'rolled_up' claim replaced with True once added to the rollups, documents
+    whose claim is older than ROLLUP_RETRY_SECONDS are rolled up again by a later flush.
+    Timestamps are stored and bucketed in UTC.
+    """
+
+    _instances: weakref.WeakSet["MongoDBUsageTracker"] = weakref.WeakSet()
+    _indexed_collections: set[str] = set()
+
     def __init__(
         self,
         client: AsyncIOMotorClient,
@@ -249,46 +892,286 @@ class MongoDBUsageTracker(MongoDBBase):
         user: str,
     ) -> None:
         super().__init__(client, db_name, f"{user}_tokens")
+        self.rollup_collection = client[db_name][f"{user}_tokens_rollup"]
+        self.flush_size = int(os.getenv("USAGE_FLUSH_SIZE", 50))
+        self.flush_interval = float(os.getenv("USAGE_FLUSH_INTERVAL", 5))
+        self.max_buffer_size = self.flush_size * 20
+        self.max_flush_backoff = float(os.getenv("USAGE_FLUSH_MAX_BACKOFF", 300))
+        self._flush_failures = 0
+        self._closed = False
+        self._buffer: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._next_rollup_retry = datetime.min
+        MongoDBUsageTracker._instances.add(self)
+
+    def push_token_usage(self, usage_data: dict) -> None:
+        """
+        Buffer usage data to be written in the background.
+
+        Args:
+            usage_data (dict): Usage data with 'tokens' and 'timestamp' keys, naive timestamps are in local time.
+        """
+        self._buffer.append(
+            {**usage_data, "timestamp": _to_utc(usage_data["timestamp"])}
+        )
+        if len(self._buffer) >= self.flush_size:
+            self._run_in_background(self.flush())
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(
+                self._flush_after_interval(self.flush_interval)
+            )
 
-    async def push_token_usage(self, usage_data: dict) -> None:
+    async def flush(self) -> None:
+        """
+        Write buffered usage data to the database. Data that failed to be written is kept in
+        the buffer for the next flush, up to max_buffer_size entries.
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            claim = uuid.uuid4().hex
+            claimed_at = _utc_now()
+            try:
+                await self._ensure_indexes()
+                await self.collection.insert_many(
+                    [
+                        {**usage, "rolled_up": claim, "rollup_claimed_at": claimed_at}
+                        for usage in batch
+                    ],
+                    ordered=False,
+                )
+            except Exception as e:
+                self._buffer = (batch + self._buffer)[-self.max_buffer_size :]
+                self._flush_failures += 1
+                delay = min(
+                    self.flush_interval * 2**self._flush_failures,
+                    self.max_flush_backoff,
+                )
+                logger.error(
+                    f"Error while pushing token usage, retrying in {delay}s: {e}"
+                )
+                if self._flush_timer is None and not self._closed:
+                    self._flush_timer = asyncio.create_task(
+                        self._flush_after_interval(delay)
+                    )
+                return
+            self._flush_failures = 0
+            await self._roll_up(batch, claim)
+            await self._retry_rollups()
+
+    async def close(self) -> None:
+        """
+        Stop background flushing and write remaining buffered usage data.
+        """
+        self._closed = True
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """
+        Drain buffers of all trackers, meant to be run on application shutdown.
+        """
+        for tracker in list(cls._instances):
+            await tracker.close()
+
+    async def _flush_after_interval(self, delay: float) -> None:
         try:
-            await self.collection.insert_one(usage_data)
-        except Exception as e:
-            logger.error(f"Error while pushing token usage: {e}")
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._flush_timer = None
+        await self.flush()
 
-    async def get_token_usage(self, hours: int) -> int:
-        time_period = datetime.now() - timedelta(hours=hours)
+    def _run_in_background(self, coroutine: Awaitable) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
-        pipeline = [
-            {"$match": {"timestamp": {"$gte": time_period}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total_input_tokens": {"$sum": "$tokens.input_tokens"},
-                    "total_output_tokens": {"$sum": "$tokens.output_tokens"},
-                    "total_tokens": {"$sum": "$tokens.total_tokens"},
-                }
-            },
-        ]
+    async def get_token_usage(self, hours: int) -> dict:
+        """
+        Get token usage of the user over the last hours, including data not written yet.
+
+        Rollups cover whole hours and days of the window, raw usage documents are only read for
+        the partial hour at its start and for the time before rollups were collected.
+
+        Args:
+            hours (int): Length of the time window.
+
+        Returns:
+            dict: Sums of token counts with 'total_' prefixed keys, e.g. 'total_input_tokens'.
+        """
+        now = _utc_now()
+        window_start = now - timedelta(hours=hours)
+        tokens = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
 
         try:
-            result = await self.collection.aggregate(pipeline).to_list(1)
-
-            if result:
-                doc = result[0]
-                return {
-                    "total_input_tokens": doc.get("total_input_tokens", 0),
-                    "total_output_tokens": doc.get("total_output_tokens", 0),
-                    "total_tokens": doc.get("total_tokens", 0),
-                }
+            await self._ensure_indexes()
+            marker = await self.rollup_collection.find_one({"granularity": "meta"})
+            rollups_since = marker["since"] if marker else now
+            edge = max(_next_hour_start(window_start), _next_hour_start(rollups_since))
+
+            # Partial hour and data collected before rollups existed
+            raw = self.collection.aggregate(
+                [
+                    {"$match": {"timestamp": {"$gte": window_start, "$lt": edge}}},
+                    {"$project": {"tokens": 1}},
+                ]
+            )
+            async for usage in raw:
+                _add_tokens(tokens, usage["tokens"])
+
+            day_from = _day_start(edge)
+            if day_from < edge:
+                day_from += timedelta(days=1)
+            day_to = _day_start(now)
+            if day_from < day_to:
+                buckets = [
+                    {"granularity": "hour", "start": {"$gte": edge, "$lt": day_from}},
+                    {"granularity": "day", "start": {"$gte": day_from, "$lt": day_to}},
+                    {"granularity": "hour", "start": {"$gte": day_to}},
+                ]
             else:
-                return {
-                    "total_input_tokens": 0,
-                    "total_output_tokens": 0,
-                    "total_tokens": 0,
-                }
+                buckets = [{"granularity": "hour", "start": {"$gte": edge}}]
+            async for rollup in self.rollup_collection.find({"$or": buckets}):
+                _add_tokens(tokens, rollup["tokens"])
         except Exception as e:
             logger.error(f"Error while getting token usage: {e}")
+            return None
+
+        for usage in self._buffer:
+            if usage["timestamp"] >= window_start:
+                _add_tokens(tokens, usage["tokens"])
+
+        return {
+            key if key.startswith("total_") else f"total_{key}": value
+            for key, value in tokens.items()
+        }
+
+    async def _roll_up(self, batch: list[dict], claim: str) -> None:
+        try:
+            await self._update_rollups(batch)
+            await self.collection.update_many(
+                {"rolled_up": claim}, {"$set": {"rolled_up": True}}
+            )
+        except Exception as e:
+            logger.error(f"Error while updating token usage rollups: {e}")
+
+    async def _retry_rollups(self) -> None:
+        """
+        Roll up usage documents whose rollup failed or was interrupted. Documents are claimed
+        with a single update, so each of them is rolled up by one tracker only.
+        """
+        now = _utc_now()
+        if now < self._next_rollup_retry:
+            return
+        self._next_rollup_retry = now + timedelta(seconds=ROLLUP_RETRY_SECONDS)
+        claim = uuid.uuid4().hex
+        try:
+            await self.collection.update_many(
+                {
+                    "rolled_up": {"$type": "string"},
+                    "rollup_claimed_at": {
+                        "$lt": now - timedelta(seconds=ROLLUP_RETRY_SECONDS)
+                    },
+                },
+                {"$set": {"rolled_up": claim, "rollup_claimed_at": now}},
+            )
+            batch = await self.collection.find(
+                {"rolled_up": claim}, projection={"tokens": 1, "timestamp": 1}
+            ).to_list(None)
+        except Exception as e:
+            logger.error(f"Error while claiming token usage to roll up: {e}")
+            return
+        if batch:
+            logger.debug(f"Rolling up {len(batch)} token usage documents again")
+            await self._roll_up(batch, claim)
+
+    async def _update_rollups(self, batch: list[dict]) -> None:
+        increments = {}
+        for usage in batch:
+            for bucket in (
+                ("hour", _hour_start(usage["timestamp"])),
+                ("day", _day_start(usage["timestamp"])),
+            ):
+                _add_tokens(increments.setdefault(bucket, {}), usage["tokens"])
+
+        operations = [
+            UpdateOne(
+                {"granularity": "meta"},
+                {"$min": {"since": min(usage["timestamp"] for usage in batch)}},
+                upsert=True,
+            )
+        ]
+        for (granularity, start), tokens in increments.items():
+            operations.append(
+                UpdateOne(
+                    {"granularity": granularity, "start": start},
+                    {"$inc": {f"tokens.{key}": value for key, value in tokens.items()}},
+                    upsert=True,
+                )
+            )
+        await self.rollup_collection.bulk_write(operations, ordered=False)
+
+    async def _ensure_indexes(self) -> None:
+        if self.collection_name in MongoDBUsageTracker._indexed_collections:
+            return
+        MongoDBUsageTracker._indexed_collections.add(self.collection_name)
+        try:
+            await self.collection.create_index("timestamp", name="timestamp")
+            await self.collection.create_index(
+                [("rolled_up", ASCENDING), ("rollup_claimed_at", ASCENDING)],
+                name="rolled_up_rollup_claimed_at",
+                partialFilterExpression={"rolled_up": {"$type": "string"}},
+            )
+            await self.rollup_collection.create_index(
+                [("granularity", ASCENDING), ("start", ASCENDING)],
+                name="granularity_start",
+                unique=True,
+            )
+        except Exception as e:
+            MongoDBUsageTracker._indexed_collections.discard(self.collection_name)
+            logger.error(f"Error while creating indexes for {self.collection_name}: {e}")
+
+
+def _utc_now() -> datetime:
+    # MongoDB returns naive UTC datetimes, usage timestamps are kept in the same form
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _to_utc(timestamp: datetime) -> datetime:
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _hour_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _next_hour_start(timestamp: datetime) -> datetime:
+    hour_start = _hour_start(timestamp)
+    return hour_start if hour_start == timestamp else hour_start + timedelta(hours=1)
+
+
+def _day_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_tokens(total: dict, tokens: dict) -> None:
+    for key, value in tokens.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
 
 
 class AgentDatabase(MongoDBBase):
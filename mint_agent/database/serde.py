@@ -0,0 +1,104 @@
+import os
+import pickle
+import zlib
+from functools import cache
+from importlib.util import find_spec
+from typing import Any
+
+import orjson
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+ZSTD_AVAILABLE = find_spec("zstandard") is not None
+if ZSTD_AVAILABLE:
+    import zstandard
+
+# Header of data written by OrjsonSerializer, JSON text and pickle never start with a zero byte
+MAGIC = b"\x00MJ"
+RAW = 0
+ZLIB = 1
+ZSTD = 2
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+class JsonPlusSerializerCompat(JsonPlusSerializer):
+    def loads(self, data: bytes) -> any:
+        if data.startswith(b"\x80") and data.endswith(b"."):
+            return pickle.loads(data)
+        return super().loads(data)
+
+
+class OrjsonSerializer(JsonPlusSerializerCompat):
+    """
+    Checkpoint serializer encoding with orjson, compressing payloads above the threshold with
+    zstd (if the zstandard package is installed) or zlib. Data is prefixed with a header, so
+    JSON and pickle data written by JsonPlusSerializerCompat can still be read.
+
+    Attributes:
+        compression_threshold (int): Payload size in bytes above which data is compressed.
+    """
+
+    def __init__(self, compression_threshold: int = 4096) -> None:
+        super().__init__()
+        self.compression_threshold = compression_threshold
+        if ZSTD_AVAILABLE:
+            self._compressor = zstandard.ZstdCompressor(level=3)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def dumps(self, obj: Any) -> bytes:
+        payload = orjson.dumps(obj, default=self._default, option=ORJSON_OPTIONS)
+        if len(payload) <= self.compression_threshold:
+            return MAGIC + bytes([RAW]) + payload
+        if ZSTD_AVAILABLE:
+            return MAGIC + bytes([ZSTD]) + self._compressor.compress(payload)
+        return MAGIC + bytes([ZLIB]) + zlib.compress(payload, 1)
+
+    def loads(self, data: bytes) -> Any:
+        if not data.startswith(MAGIC):
+            return super().loads(data)
+        codec = data[len(MAGIC)]
+        payload = data[len(MAGIC) + 1 :]
+        if codec == ZLIB:
+            payload = zlib.decompress(payload)
+        elif codec == ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise ValueError("zstandard package is required to read this data")
+            payload = self._decompressor.decompress(payload)
+        elif codec != RAW:
+            raise ValueError(f"Unknown compression codec: {codec}")
+        return self._revive(orjson.loads(payload))
+
+    def _revive(self, obj: Any) -> Any:
+        """
+        Apply the JsonPlusSerializer reviver bottom-up, as json.loads does with object_hook.
+        """
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if isinstance(value, (dict, list)):
+                    obj[key] = self._revive(value)
+            return self._reviver(obj) if "lc" in obj else obj
+        if isinstance(obj, list):
+            for index, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    obj[index] = self._revive(item)
+        return obj
+
+
+@cache
+def get_checkpoint_serde() -> SerializerProtocol:
+    """
+    Returns the checkpoint serializer selected with the CHECKPOINT_SERDE variable ('json' or 'orjson').
+
+    Returns:
+        SerializerProtocol: The serializer.
+    """
+    if os.getenv("CHECKPOINT_SERDE", "json") == "orjson":
+        return OrjsonSerializer(
+            int(os.getenv("CHECKPOINT_COMPRESSION_THRESHOLD", 4096))
+        )
+    return JsonPlusSerializerCompat()
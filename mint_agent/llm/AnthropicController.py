@@ -1,13 +1,148 @@
-from typing import Optional
+import os
+from typing import Any, AsyncIterator, List, Optional
 
-from langchain_anthropic.chat_models import ChatAnthropic
-from langchain_core.messages import AIMessage
+from dotenv import load_dotenv
+from langchain_anthropic.chat_models import ChatAnthropic, convert_to_anthropic_tool
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGenerationChunk
+from loguru import logger
 
 from mint_agent.llm.BaseController import BaseController
 
+load_dotenv()
+
 DEFAULT_MODEL = "claude-3-haiku-20240307"
 DEFAULT_MAX_TOKENS = 1000
 
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+CACHE_CONTROL = {"type": "ephemeral"}
+CACHE_USAGE_KEYS = ("cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def get_cache_usage(message: AIMessage) -> dict:
+    """
+    Get numbers of input tokens written to and read from the prompt cache for the response.
+
+    Args:
+        message (AIMessage): The response from the model.
+
+    Returns:
+        dict: Cache token counts keyed by CACHE_USAGE_KEYS, empty if the response has none.
+    """
+    usage = message.response_metadata.get("usage") or {}
+    return {
+        key: usage[key] for key in CACHE_USAGE_KEYS if usage.get(key) is not None
+    }
+
+
+try:
+    # Internals of langchain-anthropic 0.1.23, the version pinned in pyproject.toml
+    from langchain_anthropic.chat_models import (
+        _make_message_chunk_from_anthropic_event,
+        _tools_in_params,
+    )
+except ImportError:
+    logger.warning(
+        "Unsupported langchain-anthropic version, prompt cache usage of streamed responses is not reported"
+    )
+    _make_message_chunk_from_anthropic_event = None
+
+
+class PromptCachingChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic keeping prompt cache usage of streamed responses in the response metadata,
+    langchain_anthropic passes only input and output tokens of the stream start event.
+    Non-streamed responses already have it in the response metadata. If the langchain_anthropic
+    internals used here are not available, streaming falls back to ChatAnthropic and cache
+    usage of streamed responses is not reported.
+    """
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        *,
+        stream_usage: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if _make_message_chunk_from_anthropic_event is None:
+            async for chunk in super()._astream(
+                messages, stop, run_manager, stream_usage=stream_usage, **kwargs
+            ):
+                yield chunk
+            return
+        if stream_usage is None:
+            stream_usage = self.stream_usage
+        kwargs["stream"] = True
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        stream = await self._async_client.messages.create(**payload)
+        coerce_content_to_string = not _tools_in_params(payload)
+        async for event in stream:
+            message = _make_message_chunk_from_anthropic_event(
+                event,
+                stream_usage=stream_usage,
+                coerce_content_to_string=coerce_content_to_string,
+            )
+            if message is None:
+                continue
+            if event.type == "message_start":
+                message.response_metadata["usage"] = {
+                    key: getattr(event.message.usage, key, None) or 0
+                    for key in CACHE_USAGE_KEYS
+                }
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager and isinstance(message.content, str):
+                await run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+
+
+def with_cache_breakpoint(message: BaseMessage) -> BaseMessage:
+    """
+    Get a copy of the message marking the end of the prompt prefix to cache. The message
+    itself is not modified, as it is a part of the graph state.
+
+    Args:
+        message (BaseMessage): The message.
+
+    Returns:
+        BaseMessage: The message with cache control set on its last content block.
+    """
+    if isinstance(message, ToolMessage):
+        if not isinstance(message.content, str):
+            return message
+        content = [
+            {
+                "type": "tool_result",
+                "content": message.content,
+                "tool_use_id": message.tool_call_id,
+                "is_error": message.status == "error",
+                "cache_control": CACHE_CONTROL,
+            }
+        ]
+    elif isinstance(message.content, str):
+        if not message.content.strip():
+            return message
+        content = [
+            {"type": "text", "text": message.content, "cache_control": CACHE_CONTROL}
+        ]
+    else:
+        if not message.content or not isinstance(message.content[-1], dict):
+            return message
+        if message.content[-1].get("type") not in ("text", "tool_result"):
+            return message
+        content = [
+            *message.content[:-1],
+            {**message.content[-1], "cache_control": CACHE_CONTROL},
+        ]
+    return message.copy(update={"content": content})
+
 
 class AnthropicController(BaseController):
     """Class to control conversation with Anthropic's Claude model"""
@@ -20,6 +155,7 @@ class AnthropicController(BaseController):
         max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
         tools: Optional[list] = None,
         streaming: bool = True,
+        prompt_caching: Optional[bool] = None,
     ):
         """
         Initialize the AnthropicController with the specified parameters.
@@ -31,23 +167,66 @@ class AnthropicController(BaseController):
             max_tokens (Optional[int]): The maximum number of tokens for the model's output. Defaults to DEFAULT_MAX_TOKENS.
             tools (Optional[list]): A list of tools to bind to the model. Defaults to an empty list.
             streaming (bool): Whether to use streaming mode. Defaults to True.
+            prompt_caching (Optional[bool]): Whether to cache the system prompt, tool definitions and conversation prefix. Defaults to ANTHROPIC_PROMPT_CACHING variable, disabled if not set.
         """
 
         tools = tools or []
+        if prompt_caching is None:
+            prompt_caching = os.getenv("ANTHROPIC_PROMPT_CACHING", "FALSE") == "TRUE"
+        self.prompt_caching = prompt_caching
+
+        if prompt_caching:
+            tools = [convert_to_anthropic_tool(tool) for tool in tools]
+            if tools:
+                tools[-1]["cache_control"] = CACHE_CONTROL
 
-        self.client = ChatAnthropic(
+        self.client = PromptCachingChatAnthropic(
             anthropic_api_key=api_key,
             model=model_name,
             temperature=temperature,
             max_tokens=max_tokens,
             streaming=streaming,
+            default_headers=(
+                {"anthropic-beta": PROMPT_CACHING_BETA} if prompt_caching else None
+            ),
         ).bind_tools(tools)
 
+    def add_cache_breakpoints(self, messages: list) -> list:
+        """
+        Mark the system prompt and the last message as ends of cached prompt prefixes, so the
+        next calls of the turn and of the following turns read them from the cache.
+        Tool definitions are marked once, when binding the tools.
+
+        Args:
+            messages (list): A list of messages to send to the model.
+
+        Returns:
+            list: The messages with cache breakpoints.
+        """
+        if not self.prompt_caching or not messages:
+            return messages
+        messages = list(messages)
+        if isinstance(messages[0], SystemMessage) and isinstance(
+            messages[0].content, str
+        ):
+            messages[0] = SystemMessage(
+                content=[
+                    {
+                        "type": "text",
+                        "text": messages[0].content,
+                        "cache_control": CACHE_CONTROL,
+                    }
+                ]
+            )
+        if len(messages) > 1:
+            messages[-1] = with_cache_breakpoint(messages[-1])
+        return messages
+
     async def get_output(self, messages: list) -> AIMessage:
-        return await self.client.ainvoke(messages)
+        return await self.client.ainvoke(self.add_cache_breakpoints(messages))
 
-    def get_summary(self, messages: list) -> AIMessage:
+    async def get_summary(self, messages: list) -> AIMessage:
         config = {
             "tags": ["silent"],
         }
-        return self.client.invoke(messages, config)
+        return await self.client.ainvoke(messages, config)
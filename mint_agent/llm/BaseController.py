@@ -19,9 +19,8 @@ class BaseController(ABC):
         """
         raise NotImplementedError
 
-    # TODO async version causes asyncio error
     @abstractmethod
-    def get_summary(self, messages) -> AIMessage:
+    async def get_summary(self, messages) -> AIMessage:
         """
         Get a summary of the given messages from the model.
 
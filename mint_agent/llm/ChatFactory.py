@@ -1,6 +1,8 @@
+import threading
 from typing import Optional
 
 from mint_agent.llm.AnthropicController import AnthropicController
+from mint_agent.llm.BaseController import BaseController
 from mint_agent.llm.OpenAIController import OpenAIController
 
 
@@ -40,6 +42,14 @@ class ProviderConfig:
 
 
 class ChatFactory:
+    """
+    Factory of model controllers. Controllers are memoized by provider, model, bound tools and
+    parameters, so the model client is created and the tool schemas are converted only once.
+    """
+
+    _controllers: dict[tuple, BaseController] = {}
+    _lock = threading.Lock()
+
     model_controllers = {
         "ANTHROPIC": AnthropicController,
         "OPENAI": OpenAIController,
@@ -59,8 +69,23 @@ class ChatFactory:
 
     @staticmethod
     def get_model_controller(
-        provider: str, model_name: str, tools: Optional[list] = None
-    ):
+        provider: str, model_name: str, tools: Optional[list] = None, **params
+    ) -> BaseController:
+        """
+        Get a controller for the given model with the tools bound to it.
+
+        Args:
+            provider (str): The name of the provider.
+            model_name (str): The name of the model.
+            tools (Optional[list]): A list of tools to bind to the model.
+            **params: Additional hashable parameters passed to the controller.
+
+        Returns:
+            BaseController: The memoized controller.
+
+        Raises:
+            ValueError: If the provider or model is not supported.
+        """
         tools = tools or None
 
         if provider not in ChatFactory.model_controllers:
@@ -71,8 +96,36 @@ class ChatFactory:
                 f"Model {model_name} not supported for provider {provider}"
             )
 
-        controller_class = ChatFactory.model_controllers[provider]
-        return controller_class(model_name=model_name, tools=tools)
+        key = (
+            provider,
+            model_name,
+            ChatFactory.get_tools_fingerprint(tools),
+            tuple(sorted(params.items())),
+        )
+        controller = ChatFactory._controllers.get(key)
+        if controller is None:
+            with ChatFactory._lock:
+                controller = ChatFactory._controllers.get(key)
+                if controller is None:
+                    controller_class = ChatFactory.model_controllers[provider]
+                    controller = controller_class(
+                        model_name=model_name, tools=tools, **params
+                    )
+                    ChatFactory._controllers[key] = controller
+        return controller
+
+    @staticmethod
+    def get_tools_fingerprint(tools: Optional[list]) -> tuple[str, ...]:
+        """
+        Get a hashable identifier of the tool set, tools are identified by their unique names.
+
+        Args:
+            tools (Optional[list]): A list of tools.
+
+        Returns:
+            tuple[str, ...]: Names of the tools in binding order.
+        """
+        return tuple(tool.name for tool in tools or [])
 
     @staticmethod
     def get_models(provider: str) -> list[str]:
@@ -49,13 +49,13 @@ class OpenAIController(BaseController):
         )
 
         if tools:
-            self.client.bind_tools(tools)
+            self.client = self.client.bind_tools(tools)
 
     async def get_output(self, messages):
         return await self.client.ainvoke(messages)
 
-    def get_summary(self, messages):
+    async def get_summary(self, messages):
         config = {
             "tags": ["silent"],
         }
-        return self.client.invoke(messages, config)
+        return await self.client.ainvoke(messages, config)
@@ -1,25 +1,52 @@
 import os
 import traceback
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+import orjson
 import uvicorn
 from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import FileResponse
 from fastapi.websockets import WebSocketState
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
 
 from mint_agent.agent_api.CredentialManager import CredentialManager
 from mint_agent.agent_api.messages import AgentMessage, AgentMessageType, UserMessage
+from mint_agent.agent_api.StreamWriter import StreamWriter
+from mint_agent.agent_graph.graph import get_workflow
 from mint_agent.AgentMint import AgentMint
-from mint_agent.database.db_utils import AgentDatabase
+from mint_agent.database.db_utils import (
+    AgentDatabase,
+    MongoDBUsageTracker,
+    close_clients,
+    get_async_client,
+    get_db_name,
+)
+from mint_agent.tools.MintHCM.SuiteAPI import close_http_clients
 from mint_agent.utils.AgentLogger import configure_logging
 from mint_agent.utils.errors import ServerError
 
 configure_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Compiles the agent workflow, creates checkpoint indexes and starts checkpoint compaction on startup.
+    Stops compaction, writes buffered usage data and releases process-wide connection pools on shutdown.
+    """
+    checkpointer = get_workflow().checkpointer
+    await checkpointer.ensure_indexes()
+    checkpointer.start_compaction()
+    yield
+    await checkpointer.stop_compaction()
+    await MongoDBUsageTracker.close_all()
+    await close_http_clients()
+    close_clients()
+
+
 http_chat = FastAPI()
-api = FastAPI()
+api = FastAPI(lifespan=lifespan)
 credential_manager = CredentialManager()
 
 
@@ -60,7 +87,7 @@ class ConnectionManager:
         Returns:
             bool: True if the connection is established, False otherwise
         """
-        if not credential_manager.authenticate_user(user_id, token):
+        if not await credential_manager.aauthenticate_user(user_id, token):
             logger.warning(f"Failed to authenticate {websocket.client}")
             await websocket.accept()
             await websocket.send_json(
@@ -91,13 +118,13 @@ class ConnectionManager:
                 f"Attempted to disconnect with {websocket.client} that was not connected: {e}"
             )
 
-    async def send_message(self, message: str, websocket: WebSocket) -> None:
+    async def send_message(self, message: dict, websocket: WebSocket) -> None:
         """
         Sends a message to the connected socket.
         """
         if websocket.client_state == WebSocketState.CONNECTED:
             try:
-                await websocket.send_json(message)
+                await websocket.send_text(orjson.dumps(message).decode())
             except Exception as e:
                 logger.error(f"Error sending message to {websocket.client}: {e}")
                 raise
@@ -138,12 +165,11 @@ async def websocket_endpoint(
     connected = await manager.connect(websocket, user_id, token)
     if not connected:
         return
+    agent = None
+    # Agent output is streamed through the writer, which batches text chunks of the LLM
+    writer = StreamWriter(lambda message: manager.send_message(message, websocket))
     try:
-        agent_db = AgentDatabase(
-            AsyncIOMotorClient(os.getenv("MONGO_URI")),
-            os.getenv("MONGO_DB_NAME"),
-            user_id,
-        )
+        agent_db = AgentDatabase(get_async_client(), get_db_name(), user_id)
         user_data = await agent_db.get(["mint_user_id"])
 
         agent = AgentMint(
@@ -174,22 +200,29 @@ async def websocket_endpoint(
                     raise ServerError(f"Invalid message type received: {message_type}")
 
             async for message in call_agent(agent, user_input):
-                await manager.send_message(message, websocket)
+                await writer.write(message)
+            await writer.flush()
     except WebSocketDisconnect:
         await manager.disconnect(websocket)
     except ServerError as e:
         logger.error(f"Server error: {websocket.client} {traceback.format_exc()}")
+        await writer.close()
         message = AgentMessage(type=AgentMessageType.ERROR, content=e.message).to_json()
         await manager.send_message(message, websocket)
         await manager.disconnect(websocket)
         raise
     except Exception:
+        await writer.close()
         message = AgentMessage(
             type=AgentMessageType.ERROR, content="Internal error occurred"
         ).to_json()
         await manager.send_message(message, websocket)
         await manager.disconnect(websocket)
         raise
+    finally:
+        await writer.close()
+        if agent is not None:
+            await agent.close()
 
 
 def test_chat():
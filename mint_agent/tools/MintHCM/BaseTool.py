@@ -1,14 +1,21 @@
 import os
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from dotenv import load_dotenv
 from loguru import logger
 
 from mint_agent.agent_api.CredentialManager import CredentialManager
-from mint_agent.tools.MintHCM.SuiteAPI import SuiteCRM
+from mint_agent.tools.MintHCM.SuiteAPI import AsyncSuiteCRM, SuiteCRM
+from mint_agent.utils.cache import TTLCache
 
 load_dotenv()
 
+connection_cache = TTLCache(
+    max_size=int(os.getenv("MINT_CONNECTION_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("MINT_CONNECTION_CACHE_TTL", 900)),
+)
+
 
 class BaseAgentTool(ABC):
     """
@@ -54,6 +61,9 @@ class MintBaseTool(BaseAgentTool):
     """
     Class providing the base implementation for connecting to the MintHCM system.
 
+    Connections are cached process-wide per (user_id, system, credential_type), so
+    consecutive tool calls reuse the same authenticated OAuth2 session.
+
     Attributes:
         api_url (str): The URL of the MintHCM API.
     """
@@ -69,20 +79,88 @@ class MintBaseTool(BaseAgentTool):
         return "APIv8"
 
     def get_connection(self, config) -> SuiteCRM:
-        try:
-            user_id = config.get("configurable", {}).get("user_id")
-            credential_manager = CredentialManager()
-            client_id, client_secret = credential_manager.get_system_credentials(
+        user_id = config.get("configurable", {}).get("user_id")
+        cache_key = (user_id, self.system, self.credential_type)
+        suitecrm = connection_cache.get(cache_key)
+        if suitecrm is not None:
+            return suitecrm
+
+        credential_manager = CredentialManager()
+
+        def load_credentials() -> tuple:
+            # Credentials may have been rotated by another process, the cached ones are stale
+            CredentialManager.invalidate(user_id)
+            connection_cache.pop(cache_key)
+            return credential_manager.get_system_credentials(
                 user_id=user_id,
                 system=self.system,
                 credential_type=self.credential_type,
             )
-            if not client_id or not client_secret:
-                raise ValueError(
-                    f"Client ID or client secret not found for user ID: {user_id}"
-                )
-            return SuiteCRM(
-                client_id=client_id, client_secret=client_secret, url=self.api_url
+
+        client_id, client_secret = credential_manager.get_system_credentials(
+            user_id=user_id,
+            system=self.system,
+            credential_type=self.credential_type,
+        )
+        if not client_id or not client_secret:
+            raise ValueError(
+                f"Client ID or client secret not found for user ID: {user_id}"
+            )
+        suitecrm = SuiteCRM(
+            client_id=client_id,
+            client_secret=client_secret,
+            url=self.api_url,
+            credentials_loader=load_credentials,
+        )
+        connection_cache.set(cache_key, suitecrm)
+        return suitecrm
+
+    async def get_async_connection(self, config) -> AsyncSuiteCRM:
+        user_id = config.get("configurable", {}).get("user_id")
+        cache_key = (user_id, self.system, self.credential_type, "async")
+        suitecrm = connection_cache.get(cache_key)
+        if suitecrm is not None:
+            return suitecrm
+
+        credential_manager = CredentialManager()
+
+        async def load_credentials() -> tuple:
+            # Credentials may have been rotated by another process, the cached ones are stale
+            CredentialManager.invalidate(user_id)
+            connection_cache.pop(cache_key)
+            return await credential_manager.aget_system_credentials(
+                user_id=user_id,
+                system=self.system,
+                credential_type=self.credential_type,
             )
-        except Exception as e:
-            raise e
+
+        client_id, client_secret = await credential_manager.aget_system_credentials(
+            user_id=user_id,
+            system=self.system,
+            credential_type=self.credential_type,
+        )
+        if not client_id or not client_secret:
+            raise ValueError(
+                f"Client ID or client secret not found for user ID: {user_id}"
+            )
+        suitecrm = AsyncSuiteCRM(
+            client_id=client_id,
+            client_secret=client_secret,
+            url=self.api_url,
+            credentials_loader=load_credentials,
+        )
+        connection_cache.set(cache_key, suitecrm)
+        return suitecrm
+
+    @staticmethod
+    def invalidate_connections(user_id: Optional[str] = None) -> None:
+        """
+        Drop cached connections, e.g. after user credentials have changed.
+
+        Args:
+            user_id (Optional[str]): The ID of the user whose connections should be dropped. Drops all connections if not provided.
+        """
+        removed = connection_cache.invalidate(
+            lambda key: user_id is None or key[0] == user_id
+        )
+        logger.debug(f"Invalidated {removed} cached MintHCM connection(s)")
@@ -1,6 +1,9 @@
 from typing import Any, Dict, List, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
@@ -81,3 +84,39 @@ class MintCreateMeetingTool(BaseTool, MintBaseTool):
 
         except Exception as e:
             raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        attributes: Dict[str, Any],
+        attendees: List[str],
+        candidates: Optional[List[str]],
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            url = f"{self.api_url}/module"
+            data = {"type": module_name, "attributes": attributes}
+            response = await suitecrm.request(url, "post", parameters=data)
+
+            async def add_relationships(relationship_type, ids):
+                for record_id in ids:
+                    relationship_url = f'{self.api_url}/module/{module_name}/{response["data"]["id"]}/relationships/{relationship_type}'
+                    relationship_data = {
+                        "type": relationship_type.capitalize(),
+                        "id": record_id,
+                    }
+                    await suitecrm.request(
+                        relationship_url, "post", parameters=relationship_data
+                    )
+
+            if attendees:
+                await add_relationships("users", attendees)
+            if candidates:
+                await add_relationships("candidates", candidates)
+
+            return "New meeting created in module 'Meetings'."
+
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
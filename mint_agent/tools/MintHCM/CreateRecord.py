@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
@@ -40,3 +43,19 @@ class MintCreateRecordTool(BaseTool, MintBaseTool):
             return f"New record created for module: {module_name}"
         except Exception as e:
             raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        attributes: Dict[str, Any],
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            url = f"{self.api_url}/module"
+            data = {"type": module_name, "attributes": attributes}
+            await suitecrm.request(url, "post", parameters=data)
+            return f"New record created for module: {module_name}"
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
@@ -38,3 +41,20 @@ class MintCreateRelTool(BaseTool, MintBaseTool):
             return {"status": "success", "result": result}
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+    async def _arun(
+        self,
+        record_id: str,
+        related_module: str,
+        related_id: str,
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            result = await suitecrm.Meetings.create_relationship(
+                record_id, related_module, related_id
+            )
+            return {"status": "success", "result": result}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
@@ -37,3 +40,18 @@ class MintDeleteRecordTool(BaseTool, MintBaseTool):
             return f"Record with id: {id} has been deleted from module {module_name}"
         except Exception as e:
             raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        id: str,
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            url = f"{self.api_url}/module/{module_name}/{id}"
+            await suitecrm.request(url, "delete")
+            return f"Record with id: {id} has been deleted from module {module_name}"
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
@@ -1,12 +1,15 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
 
 from mint_agent.tools.MintHCM.BaseTool import MintBaseTool
-from mint_agent.tools.MintHCM.SuiteAPI import Module
+from mint_agent.tools.MintHCM.SuiteAPI import AsyncModule, Module
 
 
 class MintGetModuleFieldsInput(BaseModel):
@@ -37,3 +40,17 @@ class MintGetModuleFieldsTool(BaseTool, MintBaseTool):
             return {"fields": fields}
         except Exception as e:
             raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            module = AsyncModule(suitecrm, module_name)
+            fields = await module.fields()
+            return {"fields": fields}
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
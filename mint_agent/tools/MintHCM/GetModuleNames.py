@@ -33,18 +33,27 @@ class MintGetModuleNamesTool(BaseTool, MintBaseTool):
     ) -> Dict[str, Any]:
         try:
             suitecrm = self.get_connection(config)
-            modules = suitecrm.get_modules()
-
-            if self.use_blacklist:
-                modules = [
-                    module for module in modules if module not in self.module_blacklist
-                ]
-
-            if self.use_whitelist:
-                modules = [
-                    module for module in modules if module in self.module_whitelist
-                ]
+            return self._filter_modules(suitecrm.get_modules())
+        except Exception as e:
+            return f"Error occured while trying to get list of modules: {e}"
 
-            return modules
+    async def _arun(
+        self,
+        config: RunnableConfig,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            return self._filter_modules(await suitecrm.get_modules())
         except Exception as e:
             return f"Error occured while trying to get list of modules: {e}"
+
+    def _filter_modules(self, modules: List[str]) -> List[str]:
+        if self.use_blacklist:
+            modules = [
+                module for module in modules if module not in self.module_blacklist
+            ]
+
+        if self.use_whitelist:
+            modules = [module for module in modules if module in self.module_whitelist]
+
+        return modules
@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
@@ -33,3 +36,17 @@ class MintGetRelTool(BaseTool, MintBaseTool):
             return {"status": "success"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+    async def _arun(
+        self,
+        record_id: str,
+        related_module: str,
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            await suitecrm.Meetings.get_relationship(record_id, related_module)
+            return {"status": "success"}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
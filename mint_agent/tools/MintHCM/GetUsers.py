@@ -1,64 +1,121 @@
+from contextlib import aclosing
+from itertools import islice
 from typing import Any, Dict, List, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
 
 from mint_agent.tools.MintHCM.BaseTool import MintBaseTool
-from mint_agent.tools.MintHCM.SuiteAPI import Module, SuiteCRM
+from mint_agent.tools.MintHCM.SuiteAPI import AsyncModule, Module
+
+
+class MintGetUsersInput(BaseModel):
+    limit: int = Field(
+        50,
+        description="Maximum number of users to return, at most 100.",
+    )
 
 
 class MintGetUsersTool(BaseTool, MintBaseTool):
     name: str = "MintGetUsersTool"
     description: str = "Tool to retrieve list of users in MintHCM. Use this to get list of users in MintHCM and their details such as id, name, phone numbers, email, address etc."
+    args_schema: Type[BaseModel] = MintGetUsersInput
+
+    max_limit: int = 100
 
     def _run(
         self,
         config: RunnableConfig,
+        limit: int = 50,
         query_params: Optional[Dict[str, Any]] = None,
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> Dict[str, Any]:
         try:
             suitecrm = self.get_connection(config)
             module = Module(suitecrm, "Users")
-            api_response = module.get_all()
+            limit = self._limit(limit)
+            users = list(islice(module.iter_records(page_size=limit), limit))
+            total_count = module.count() if len(users) == limit else len(users)
+            return self._format_response(users, total_count)
+
+        except Exception as e:
+            return f"While trying to get users, an error occurred: {e}"
 
+    async def _arun(
+        self,
+        config: RunnableConfig,
+        limit: int = 50,
+        query_params: Optional[Dict[str, Any]] = None,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            module = AsyncModule(suitecrm, "Users")
+            limit = self._limit(limit)
             users = []
-            for user in api_response["data"]:
-                user_id = user["id"]
-                attributes = user["attributes"]
+            async with aclosing(module.iter_records(page_size=limit)) as records:
+                async for user in records:
+                    users.append(user)
+                    if len(users) == limit:
+                        break
+            total_count = await module.count() if len(users) == limit else len(users)
+            return self._format_response(users, total_count)
 
-                name = attributes.get("full_name", "")
+        except Exception as e:
+            return f"While trying to get users, an error occurred: {e}"
 
-                phone_home = attributes.get("phone_home", "")
-                phone_mobile = attributes.get("phone_mobile", "")
-                phone_work = attributes.get("phone_work", "")
-                phone_other = attributes.get("phone_other", "")
+    def _limit(self, limit: int) -> int:
+        return min(max(limit, 1), self.max_limit)
 
-                address_street = attributes.get("address_street", "")
-                address_city = attributes.get("address_city", "")
-                address_state = attributes.get("address_state", "")
-                address_country = attributes.get("address_country", "")
-                address_postalcode = attributes.get("address_postalcode", "")
+    def _format_response(
+        self, users: List[Dict[str, Any]], total_count: int
+    ) -> Dict[str, Any]:
+        result = {
+            "users": [self._format_user(user) for user in users],
+            "total_count": total_count,
+        }
+        if total_count > len(users):
+            result["note"] = (
+                f"Showing {len(users)} of {total_count} users. "
+                "Use MintSearchTool on the Users module with filters to find specific users."
+            )
+        return result
 
-                user_type = attributes.get("UserType", "")
-                employee_status = attributes.get("employee_status", "")
+    @staticmethod
+    def _format_user(user: Dict[str, Any]) -> str:
+        user_id = user["id"]
+        attributes = user["attributes"]
 
-                email_address = attributes.get("email_addresses_primary", "")
+        name = attributes.get("full_name", "")
 
-                position = attributes.get("position_name", "")
-                reports_to_id = attributes.get("reports_to_id", "")
+        phone_home = attributes.get("phone_home", "")
+        phone_mobile = attributes.get("phone_mobile", "")
+        phone_work = attributes.get("phone_work", "")
+        phone_other = attributes.get("phone_other", "")
 
-                user_data = f"""ID: {user_id}, Name and surname: {name}, id of supervisor: {reports_to_id}
-                Home phone: {phone_home}, Mobile phone: {phone_mobile}, Work phone: {phone_work}, Other phone: {phone_other}, Email: {email_address},
-                Address: (street: {address_street}, city: {address_city}, state: {address_state}, country: {address_country}, postal code: {address_postalcode}),
-                User type: {user_type},
-                Employee status: {employee_status},
-                Position: {position},
-                """
-                users.append(user_data)
-            return users
+        address_street = attributes.get("address_street", "")
+        address_city = attributes.get("address_city", "")
+        address_state = attributes.get("address_state", "")
+        address_country = attributes.get("address_country", "")
+        address_postalcode = attributes.get("address_postalcode", "")
 
-        except Exception as e:
-            return f"While trying to get users, an error occurred: {e}"
+        user_type = attributes.get("UserType", "")
+        employee_status = attributes.get("employee_status", "")
+
+        email_address = attributes.get("email_addresses_primary", "")
+
+        position = attributes.get("position_name", "")
+        reports_to_id = attributes.get("reports_to_id", "")
+
+        return f"""ID: {user_id}, Name and surname: {name}, id of supervisor: {reports_to_id}
+        Home phone: {phone_home}, Mobile phone: {phone_mobile}, Work phone: {phone_work}, Other phone: {phone_other}, Email: {email_address},
+        Address: (street: {address_street}, city: {address_city}, state: {address_state}, country: {address_country}, postal code: {address_postalcode}),
+        User type: {user_type},
+        Employee status: {employee_status},
+        Position: {position},
+        """
@@ -1,15 +1,22 @@
 import json
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
+from loguru import logger
 from pydantic import BaseModel, Field
 
 from mint_agent.tools.MintHCM.BaseTool import MintBaseTool
 from mint_agent.tools.MintHCM.GetModuleFields import MintGetModuleFieldsTool
 from mint_agent.tools.MintHCM.GetModuleNames import MintGetModuleNamesTool
-from mint_agent.tools.MintHCM.SuiteAPI import Module
+from mint_agent.tools.MintHCM.SuiteAPI import AsyncModule, Module
+
+# Rough number of characters per token used to estimate the size of tool output
+CHARS_PER_TOKEN = 4
 
 
 class MintSearchInput(BaseModel):
@@ -46,6 +53,22 @@ class MintSearchInput(BaseModel):
         ...,
         description="List of fields to retrieve from the module. Example: 'id,name,date_start,status'. Always use MintGetModuleFieldsTool to get list of fields available in the module. Do not use this tool without knowing the fields available in the module!",
     )
+    limit: int = Field(
+        20,
+        description="Maximum number of records to return, at most 100. Request only as many records as you need.",
+    )
+    offset: int = Field(
+        0,
+        description="Number of matching records to skip. To get more records call the tool again with offset set to next_offset from the previous result.",
+    )
+    sort: Optional[str] = Field(
+        None,
+        description="Field to sort the records by. Prefix with '-' for descending order. Example: '-date_start'",
+    )
+    count_total: bool = Field(
+        False,
+        description="Set to true to get the exact number of all matching records. It takes an extra request, use it only when the number is needed.",
+    )
 
 
 class MintSearchTool(BaseTool, MintBaseTool):
@@ -53,6 +76,9 @@ class MintSearchTool(BaseTool, MintBaseTool):
     description: str = "Tool to retrieve list of records from MintHCM. Always use MintGetModuleFieldsTool to get list of fields available in the module. Do not use this tool without knowing the fields available in the module!"
     args_schema: Type[BaseModel] = MintSearchInput
 
+    max_limit: int = 100
+    max_result_tokens: int = 4000
+
     def _run(
         self,
         module_name: str,
@@ -60,106 +86,200 @@ class MintSearchTool(BaseTool, MintBaseTool):
         operator: str,
         fields: str,
         config: RunnableConfig,
+        limit: int = 20,
+        offset: int = 0,
+        sort: Optional[str] = None,
+        count_total: bool = False,
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> Dict[str, Any]:
         try:
-            module_names_tool = MintGetModuleNamesTool()
-            module_names = module_names_tool._run(config=config)
+            module_names = MintGetModuleNamesTool()._run(config=config)
+            self._check_module(module_name, module_names)
+            module_fields = MintGetModuleFieldsTool()._run(module_name, config=config)
+            fields_array, query_filters, operator = self._prepare_query(
+                module_name, filters, operator, fields, sort, module_fields
+            )
+            page_size, page_number, skip = self._page(limit, offset)
+
+            suitecrm = self.get_connection(config)
+            module = Module(suitecrm, module_name)
+            response = module.get_page(
+                page_number, page_size, fields_array, query_filters, sort, operator
+            )
+            total_count = self._total_count(response, page_size, page_number)
+            if total_count is None and count_total:
+                total_count = module.count(query_filters, operator)
+            return self._format_response(
+                response, skip, offset, total_count, page_size, page_number
+            )
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        filters: str,
+        operator: str,
+        fields: str,
+        config: RunnableConfig,
+        limit: int = 20,
+        offset: int = 0,
+        sort: Optional[str] = None,
+        count_total: bool = False,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            module_names = await MintGetModuleNamesTool()._arun(config=config)
+            self._check_module(module_name, module_names)
+            module_fields = await MintGetModuleFieldsTool()._arun(
+                module_name, config=config
+            )
+            fields_array, query_filters, operator = self._prepare_query(
+                module_name, filters, operator, fields, sort, module_fields
+            )
+            page_size, page_number, skip = self._page(limit, offset)
+
+            suitecrm = await self.get_async_connection(config)
+            module = AsyncModule(suitecrm, module_name)
+            response = await module.get_page(
+                page_number, page_size, fields_array, query_filters, sort, operator
+            )
+            total_count = self._total_count(response, page_size, page_number)
+            if total_count is None and count_total:
+                total_count = await module.count(query_filters, operator)
+            return self._format_response(
+                response, skip, offset, total_count, page_size, page_number
+            )
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
+
+    def _page(self, limit: int, offset: int) -> tuple[int, int, int]:
+        """
+        Maps limit and offset to SuiteCRM page size and number. Offsets that are not a multiple of
+        the limit start inside a page, the leading records of that page are skipped.
+
+        Returns:
+            tuple[int, int, int]: Page size, page number and number of records to skip in the page.
+        """
+        page_size = min(max(limit, 1), self.max_limit)
+        offset = max(offset, 0)
+        return page_size, offset // page_size + 1, offset % page_size
+
+    @staticmethod
+    def _total_count(
+        response: Dict[str, Any], page_size: int, page_number: int
+    ) -> Optional[int]:
+        """
+        Derives the number of matching records from the page response, if possible without another request.
+
+        Returns:
+            Optional[int]: The number of matching records or None if it is only known by counting.
+        """
+        total_pages = response.get("meta", {}).get("total-pages")
+        if total_pages is None:
+            return None
+        total_pages = int(total_pages)
+        if total_pages == 0:
+            return 0
+        data = response.get("data") or []
+        # Pages past the last one are empty, so the size of the last page is not known
+        if page_number == total_pages and data:
+            return (total_pages - 1) * page_size + len(data)
+        return None
+
+    @staticmethod
+    def _check_module(module_name: str, module_names: list[str]) -> None:
+        if module_name not in module_names:
+            raise ToolException(
+                f"Module {module_name} does not exist. Try to use MintGetModuleNamesTool to get list of available modules."
+            )
 
-            if module_name not in module_names:
+    @staticmethod
+    def _prepare_query(
+        module_name: str,
+        filters: str,
+        operator: str,
+        fields: str,
+        sort: Optional[str],
+        module_fields: Dict[str, Any],
+    ) -> tuple[list[str], Dict[str, Any], str]:
+        # we need to check if the fields provided in the fields argument are in the module_fields
+        # Example module_fields:
+        # {'fields': {'id': {'dbType': 'id'}, 'name': {'dbType': 'name'}, 'date_entered': {'dbType': 'datetime'}}
+        fields_array = fields.replace(" ", "").split(",")
+        field_names = module_fields["fields"].keys()
+        for field in fields_array:
+            if field and field not in field_names:
                 raise ToolException(
-                    f"Module {module_name} does not exist. Try to use MintGetModuleNamesTool to get list of available modules."
+                    f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module."
                 )
 
-            module_fields_tool = MintGetModuleFieldsTool()
-
-            module_fields = module_fields_tool._run(module_name, config=config)
-            # we need to check if the fields provided in the fields argument are in the module_fields
-            # Example module_fields:
-            # {'fields': {'id': {'dbType': 'id'}, 'name': {'dbType': 'name'}, 'date_entered': {'dbType': 'datetime'}}
-            fields_array = fields.replace(" ", "").split(",")
-            fieldss = module_fields["fields"]
-            field_names = fieldss.keys()
-            for field in fields_array:
-                if field and field not in field_names:
-                    # print(f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module.")
-                    # print(field_names)
-                    raise ToolException(
-                        f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module."
-                    )
+        if sort and sort.removeprefix("-") not in field_names:
+            raise ToolException(
+                f"Cannot sort by {sort}, field {sort.removeprefix('-')} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module."
+            )
 
-            suitecrm = self.get_connection(config)
-            module = Module(suitecrm, module_name)
+        filters_array = json.loads(filters)
+
+        if operator not in ["and", "or"]:
+            operator = "and"
+
+        filter_list_filters = filters_array.get("filters")
+        if not filter_list_filters:
+            return fields_array, {"deleted": "0"}, operator
 
-            # print(f"Module: {module_name}, filters: {filters}, fields: {fields}")
-
-            filters_array = json.loads(filters)
-            fields_array = fields.replace(" ", "").split(",")
-
-            # print(f"Filters: {filters_array}")
-            # print(f"Fields: {fields_array}")
-
-            if operator not in ["and", "or"]:
-                operator = "and"
-            operators = {
-                "=": "EQ",
-                "<>": "NEQ",
-                ">": "GT",
-                ">=": "GTE",
-                "<": "LT",
-                "<=": "LTE",
-            }
-
-            if "filters" in filters_array:
-                filter_list_filters = filters_array["filters"]
-
-                print(f"filter_list_filters: {filter_list_filters}")
-                #    filter_str = ""
-                # for f in filter_list_filters:
-                #    print(f'fff: {f}')
-                #     for key in f:
-                #         filter_str += f"{key} {f[key]['operator']} '{f[key]['value']}' AND "
-
-                if filter_list_filters:
-                    # we need to check if the fields provided in the filters are in the module_fields
-                    for field, value in filter_list_filters.items():
-                        if field and field not in field_names:
-                            # print(f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module.")
-                            print(module_fields)
-
-                            raise ToolException(
-                                f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module."
-                            )
-
-                    #        for field, value in filter_list_filters.items():
-                    #            print(f'fff: {field}, {value}')
-                    #            if isinstance(value, dict):
-                    #                filter_str = f'{filter_str}[{field}][{operators[value["operator"]]}]={value["value"]}and&'
-                    #            else:
-                    #                filter_str = f'{filter_str}[{field}][eq]={value}and&'
-                    #        print(f'Filters string : {filter_str}')
-
-                    # filter_list_filters.operator = 'AND'
-                    response = module.get(
-                        fields=fields_array,
-                        sort=None,
-                        operator=operator,
-                        **filter_list_filters,
-                    )
-                else:
-                    response = module.get(
-                        fields=fields_array, sort=None, operator=operator, deleted="0"
-                    )
-            else:
-                response = module.get(
-                    fields=fields_array, sort=None, operator=operator, deleted="0"
+        # we need to check if the fields provided in the filters are in the module_fields
+        for field in filter_list_filters:
+            if field and field not in field_names:
+                raise ToolException(
+                    f"Field {field} is not available in the module {module_name}. Use MintGetModuleFieldsTool to get list of fields available in the module."
                 )
-            print(f"response: {response}")
-            data = response
-            # copy rows from data to return_data, only the attributes
-            return_data = []
-            for row in data:
-                return_data.append({"id": row["id"], **row["attributes"]})
-            return {"data": return_data}
-        except Exception as e:
-            raise ToolException(f"Error: {e}")
+        return fields_array, filter_list_filters, operator
+
+    def _format_response(
+        self,
+        response: Dict[str, Any],
+        skip: int,
+        offset: int,
+        total_count: Optional[int],
+        page_size: int,
+        page_number: int,
+    ) -> Dict[str, Any]:
+        # copy rows from data to return_data, only the attributes
+        return_data = [
+            {"id": row["id"], **row["attributes"]} for row in response["data"][skip:]
+        ]
+
+        note = None
+        budget = self.max_result_tokens * CHARS_PER_TOKEN
+        size = len(json.dumps(return_data, default=str))
+        while size > budget and len(return_data) > 1:
+            size -= len(json.dumps(return_data.pop(), default=str)) + 2
+            note = "Result was truncated to fit the size limit. Request fewer fields or a smaller limit."
+
+        result = {"data": return_data, "offset": offset}
+        next_offset = offset + len(return_data)
+        if total_count is not None:
+            result["total_count"] = total_count
+            has_more = next_offset < total_count
+            of_total = f" of {total_count}"
+        else:
+            # Counting takes another request, the page count only bounds the number of records
+            total_pages = int(response.get("meta", {}).get("total-pages", page_number))
+            has_more = (
+                next_offset < offset - skip + len(response["data"])
+                or page_number < total_pages
+            )
+            of_total = f" of at most {total_pages * page_size}"
+        if has_more:
+            result["next_offset"] = next_offset
+            note = (
+                f"{note + ' ' if note else ''}Showing records {offset + 1}-{next_offset}{of_total}. "
+                f"Call the tool again with offset={next_offset} to get more records."
+            )
+        if note:
+            result["note"] = note
+        logger.debug(
+            f"MintSearchTool returned {len(return_data)}{of_total} records"
+        )
+        return result
@@ -1,9 +1,13 @@
+import asyncio
 import atexit
+import importlib.util
 import json
-import math
+import os
 import uuid
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
 from urllib.parse import quote
 
+import httpx
 from oauthlib.oauth2 import (
     BackendApplicationClient,
     InvalidClientError,
@@ -12,94 +16,168 @@ from oauthlib.oauth2 import (
 from oauthlib.oauth2.rfc6749.errors import CustomOAuth2Error
 from requests_oauthlib import OAuth2Session
 
+from mint_agent.tools.MintHCM.TokenStore import get_token_store
+from mint_agent.utils.cache import TTLCache
+
+# HTTP/2 is negotiated only when the optional h2 package is installed
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("MINT_API_MAX_CONNECTIONS", 20))
+KEEPALIVE_EXPIRY = 30.0
+REQUEST_TIMEOUT = 30.0
+DEFAULT_PAGE_SIZE = 100
+
+MODULE_NAMES = [
+    "Accounts",
+    "Bugs",
+    "Calendar",
+    "Calls",
+    "Cases",
+    "Campaigns",
+    "Contacts",
+    "Documents",
+    "Email",
+    "Emails",
+    "Employees",
+    "Leads",
+    "Lists",
+    "Meetings",
+    "Notes",
+    "Opportunities",
+    "Projects",
+    "Spots",
+    "Surveys",
+    "Target",
+    "Targets",
+    "Tasks",
+    "Templates",
+    "Candidates",
+]
+
+_http_clients: dict[str, httpx.AsyncClient] = {}
+
+# Module lists and module fields shared by all users of a MintHCM instance
+metadata_cache = TTLCache(
+    max_size=1024, ttl=float(os.getenv("MINT_METADATA_CACHE_TTL", 3600))
+)
+
+
+class AuthenticationError(Exception):
+    """
+    Raised when MintHCM rejects the client credentials.
+    """
+
 
 class SuiteCRM:
+    """
+    If the credentials are rejected, they are loaded again with credentials_loader and the
+    login or request is retried once, so a long-lived connection picks up rotated credentials.
+    """
+
     def __init__(
-        self, client_id: str, client_secret: str, url: str, logout_on_exit: bool = False
+        self,
+        client_id: str,
+        client_secret: str,
+        url: str,
+        logout_on_exit: bool = False,
+        credentials_loader: Optional[Callable[[], tuple]] = None,
     ):
         self.baseurl = url
         self._client_id = client_id
         self._client_secret = client_secret
         self._logout_on_exit = logout_on_exit
+        self._credentials_loader = credentials_loader
+        self._token_store = get_token_store()
         self._headers = (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36"
         )
-        self._login()
+        try:
+            self._login()
+        except AuthenticationError:
+            if not self._reload_credentials():
+                raise
         self._modules()
 
     def _modules(self):
-        self.Accounts = Module(self, "Accounts")
-        self.Bugs = Module(self, "Bugs")
-        self.Calendar = Module(self, "Calendar")
-        self.Calls = Module(self, "Calls")
-        self.Cases = Module(self, "Cases")
-        self.Campaigns = Module(self, "Campaigns")
-        self.Contacts = Module(self, "Contacts")
-        self.Documents = Module(self, "Documents")
-        self.Email = Module(self, "Email")
-        self.Emails = Module(self, "Emails")
-        self.Employees = Module(self, "Employees")
-        self.Leads = Module(self, "Leads")
-        self.Lists = Module(self, "Lists")
-        self.Meetings = Module(self, "Meetings")
-        self.Notes = Module(self, "Notes")
-        self.Opportunities = Module(self, "Opportunities")
-        self.Projects = Module(self, "Projects")
-        self.Spots = Module(self, "Spots")
-        self.Surveys = Module(self, "Surveys")
-        self.Target = Module(self, "Target")
-        self.Targets = Module(self, "Targets")
-        self.Tasks = Module(self, "Tasks")
-        self.Templates = Module(self, "Templates")
-        self.Candidates = Module(self, "Candidates")
-
-    def _refresh_token(self) -> None:
-        """
-        Fetch a new token from from token access url, specified in config file.
-        :return: None
+        for module_name in MODULE_NAMES:
+            setattr(self, module_name, Module(self, module_name))
+
+    def _fetch_token(self) -> dict:
+        """
+        Fetch a new token from token access url.
+        :return: (dictionary) The token
         """
         try:
-            self.OAuth2Session.fetch_token(
+            return self.OAuth2Session.fetch_token(
                 token_url=self.baseurl[:-2] + "access_token",
                 client_id=self._client_id,
                 client_secret=self._client_secret,
             )
         except InvalidClientError:
-            exit("401 (Unauthorized) - client id/secret")
+            raise AuthenticationError("401 (Unauthorized) - client id/secret")
         except CustomOAuth2Error:
-            exit("401 (Unauthorized) - client id")
-        # Update configuration file with new token'
-        with open("AccessToken.txt", "w+") as file:
-            file.write(str(self.OAuth2Session.token))
+            raise AuthenticationError("401 (Unauthorized) - client id")
+
+    def _refresh_token(self, stale_token: dict = None) -> None:
+        """
+        Get a valid token from the token store, a new one is fetched only if the stored token is missing,
+        about to expire or was rejected.
+        :param stale_token: (dictionary) Token rejected by the server that has to be replaced.
+        :return: None
+        """
+        token = self._token_store.get_valid_token(
+            self._client_id, self._fetch_token, stale_token
+        )
+        if token is not self.OAuth2Session.token:
+            self.OAuth2Session.token = token
 
     def _login(self) -> None:
         """
-        Checks to see if a Oauth2 Session exists, if not builds a session and retrieves the token from the config file,
-        if no token in config file, fetch a new one.
+        Checks to see if a Oauth2 Session exists, if not builds a session and retrieves the token from the token store,
+        if no valid token is stored, fetch a new one.
 
         :return: None
         """
         # Does session exist?
         if not hasattr(self, "OAuth2Session"):
-            client = BackendApplicationClient(client_id=self._client_id)
-            self.OAuth2Session = OAuth2Session(client=client, client_id=self._client_id)
-            self.OAuth2Session.headers.update(
-                {"User-Agent": self._headers, "Content-Type": "application/json"}
-            )
-            with open("AccessToken.txt", "w+") as file:
-                token = file.read()
-                if token == "":
-                    self._refresh_token()
-                else:
-                    self.OAuth2Session.token = token
-        else:
+            self._create_session()
             self._refresh_token()
+        else:
+            self._refresh_token(stale_token=self.OAuth2Session.token)
 
         # Logout on exit
         if self._logout_on_exit:
             atexit.register(self._logout)
 
+    def _create_session(self) -> None:
+        client = BackendApplicationClient(client_id=self._client_id)
+        self.OAuth2Session = OAuth2Session(client=client, client_id=self._client_id)
+        self.OAuth2Session.headers.update(
+            {"User-Agent": self._headers, "Content-Type": "application/json"}
+        )
+
+    def _reload_credentials(self) -> bool:
+        """
+        Load the credentials again, e.g. after they were rotated, and log in with them.
+
+        :return: (bool) True if the credentials have changed
+        """
+        if self._credentials_loader is None:
+            return False
+        client_id, client_secret = self._credentials_loader()
+        if not client_id or (client_id, client_secret) == (
+            self._client_id,
+            self._client_secret,
+        ):
+            return False
+        # The stored token was issued for the rejected credentials
+        self._token_store.delete(self._client_id)
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._create_session()
+        self._refresh_token()
+        return True
+
     def _logout(self) -> None:
         """
         Logs out current Oauth2 Session
@@ -107,13 +185,13 @@ class SuiteCRM:
         """
         url = "/logout"
         self.request(f"{self.baseurl}{url}", "post")
-        with open("AccessToken.txt", "w+") as file:
-            file.write("")
+        self._token_store.delete(self._client_id)
 
     def request(self, url: str, method, parameters="") -> dict:
         """
         Makes a request to the given url with a specific method and data. If the request fails because the token expired
-        the session will re-authenticate and attempt the request again with a new token.
+        the session will re-authenticate and attempt the request again with a new token. If the credentials were
+        rejected and they have changed since, the request is attempted again with the new credentials.
 
         :param url: (string) The url
         :param method: (string) Get, Post, Patch, Delete
@@ -121,7 +199,14 @@ class SuiteCRM:
 
         :return: (dictionary) Data
         """
+        try:
+            return self._request(url, method, parameters)
+        except AuthenticationError:
+            if not self._reload_credentials():
+                raise
+            return self._request(url, method, parameters)
 
+    def _request(self, url: str, method, parameters="") -> dict:
         url = quote(url, safe="/:?=&")
         data = json.dumps({"data": parameters})
         try:
@@ -129,13 +214,15 @@ class SuiteCRM:
         except AttributeError:
             return
 
+        self._refresh_token()
+
         try:
             if parameters == "":
                 data = the_method(url)
             else:
                 data = the_method(url, data=data)
         except TokenExpiredError:
-            self._refresh_token()
+            self._refresh_token(stale_token=self.OAuth2Session.token)
             if parameters == "":
                 data = the_method(url)
             else:
@@ -144,14 +231,14 @@ class SuiteCRM:
         # Revoked Token
         attempts = 0
         while data.status_code == 401 and attempts < 1:
-            self._refresh_token()
+            self._refresh_token(stale_token=self.OAuth2Session.token)
             if parameters == "":
                 data = the_method(url)
             else:
                 data = the_method(url, data=data)
             attempts += 1
         if data.status_code == 401:
-            exit(
+            raise AuthenticationError(
                 "401 (Unauthorized) client id/secret has been revoked, new token was attempted and failed."
             )
 
@@ -167,9 +254,14 @@ class SuiteCRM:
         Gets all the modules that are available in the SuiteCRM.
         :return: (list) A list of all the modules.
         """
-        url = "/meta/modules"
-        module_response = self.request(f"{self.baseurl}{url}", "get")
-        return list(module_response["data"]["attributes"].keys())
+        cache_key = (self.baseurl, "modules")
+        modules = metadata_cache.get(cache_key)
+        if modules is None:
+            url = "/meta/modules"
+            module_response = self.request(f"{self.baseurl}{url}", "get")
+            modules = list(module_response["data"]["attributes"].keys())
+            metadata_cache.set(cache_key, modules)
+        return list(modules)
 
 
 class Module:
@@ -208,45 +300,14 @@ class Module:
         Gets all the attributes that can be set in a record.
         :return: (list) All the names of attributes in a record.
         """
-        # Get total record count
-        url = f"/meta/fields/{self.module_name}"
-        # Olka TODO
-        result = self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
-        if "errors" in result:
-            raise Exception(result["errors"])
-        if "data" in result:
-            attributes = result["data"]["attributes"]
-
-            # attributes = {
-            #    "attributes": {
-            #        "id": {
-            #            "vname": "LBL_ID",
-            #            "type": "id",
-            #            "required": "true",
-            #            "dbType": "id"
-            #        },
-            #        "name": {
-            #            "vname": "LBL_SUBJECT",
-            #            "required": "true",
-            #            "type": "name",
-            #            "dbType": "varchar",
-            #            "len": "255"
-            #        },
-            #    }
-            # }
-            # attributes is a list of dictionaries. We only need the keys and value of dbType
-            # expected result:
-            # attrs_shoprt = {
-            #     "id": { "dbType": "id" },
-            #     "name": { "dbType": "varchar" }
-            # }
-            attrs_short = {}
-            for key, value in attributes.items():
-                attrs_short[key] = {"dbType": value["dbType"]}
-            # print(attrs_short)
-            return attrs_short
-            # return list(result['data'][0]['attributes'].keys())
-        raise Exception(result)
+        cache_key = (self.suitecrm.baseurl, "fields", self.module_name)
+        fields = metadata_cache.get(cache_key)
+        if fields is None:
+            url = f"/meta/fields/{self.module_name}"
+            result = self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+            fields = _short_fields(result)
+            metadata_cache.set(cache_key, fields)
+        return fields
 
     def get(
         self, fields: list = None, sort: str = None, operator: str = "and", **filters
@@ -264,83 +325,78 @@ class Module:
 
         :return: (list) A list of dictionaries, where each dictionary is a record.
         """
-        # Fields Constructor
-        if fields:
-            fields = f"?fields[{self.module_name}]=" + ",".join(fields)
-            url = f"/module/{self.module_name}{fields}&filter"
-        else:
-            url = f"/module/{self.module_name}?filter"
-        if operator == "and" or operator == "or":
-            url = f"{url}[operator]={operator}&filter"
-        else:
-            url = f"{url}[operator]=and&filter"  # Olka TODO
-
-        # Filter Constructor
-        operators = {
-            "=": "EQ",
-            "<>": "NEQ",
-            ">": "GT",
-            ">=": "GTE",
-            "<": "LT",
-            "<=": "LTE",
-            "LIKE": "LIKE",
-            "NOT LIKE": "NOT_IKE",
-            "IN": "IN",
-            "NOT IN": "NOT_IN",
-        }
-        for field, value in filters.items():
-            if isinstance(value, dict):
-                if value["operator"] == "BETWEEN":
-                    # in value there are two values separated by comma
-                    values = value["value"].split(",")
-                    url = f'{url}[{field}][{operators[">"]}]= {values[0]}&'
-                    url = f'{url}[{field}][{operators["<"]}]= {values[1]}&'
-
-                else:
-                    url = f'{url}[{field}][{operators[value["operator"]]}]={value["value"]}&'
-            else:
-                url = f"{url}[{field}][eq]={value}&"
-        url = url[:-1]
+        sort = f"-{sort}" if sort else None
+        url = _records_url(self.module_name, fields, sort, operator, filters)
+        result = self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+        return _records(result)
+
+    def get_page(
+        self,
+        page_number: int,
+        page_size: int,
+        fields: list = None,
+        filters: dict = None,
+        sort: str = None,
+        operator: str = "and",
+    ) -> dict:
+        """
+        Gets a single page of records matching the filters.
 
-        # Sort
-        if sort:
-            url = f"{url}&sort=-{sort}"
+        :param page_number: (int) The number of the page, starting from 1.
+        :param page_size: (int) Number of records per page.
+        :param fields: (list) A list of fields you want to be returned from each record.
+        :param filters: (dictionary) Filters to apply, see Module.get.
+        :param sort: (string) The field you want the records to be sorted by, prefixed with '-' for descending order.
+        :param operator: (string) Operator joining the filters, 'and' or 'or'.
 
-        # Execute
+        :return: (dictionary) The JSON:API response with 'data' and 'meta' keys.
+        """
+        url = _records_url(self.module_name, fields, sort, operator, filters or {})
+        url = _page_url(url, page_number, page_size)
         result = self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
-        # TODO Olka
-        if "data" in result:
-            return result["data"]
-        if "errors" in result:
-            raise Exception(result["errors"])
-        raise Exception(result["errors"])
+        _records(result)
+        return result
+
+    def count(self, filters: dict = None, operator: str = "and") -> int:
+        """
+        Counts records matching the filters, using single record pages so that total-pages equals the record count.
+
+        :param filters: (dictionary) Filters to apply, see Module.get.
+        :param operator: (string) Operator joining the filters, 'and' or 'or'.
+
+        :return: (int) Number of matching records.
+        """
+        result = self.get_page(1, 1, ["id"], filters, None, operator)
+        return _total_pages(result, len(result["data"]))
+
+    def iter_records(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        fields: list = None,
+        filters: dict = None,
+        sort: str = None,
+        operator: str = "and",
+    ) -> Iterator[dict]:
+        """
+        Iterates over all records matching the filters, requesting one page at a time.
+
+        :param page_size: (int) Number of records requested per page.
+        :param fields: (list) A list of fields you want to be returned from each record.
+        :param filters: (dictionary) Filters to apply, see Module.get.
+        :param sort: (string) The field you want the records to be sorted by, prefixed with '-' for descending order.
+        :param operator: (string) Operator joining the filters, 'and' or 'or'.
 
-    # TODO 1. Returns list of strings instead of dicts. 2. To check if its necessary to handle pagination
-    # def get_all(self, record_per_page: int = 100) -> list:
-    #     """
-    #     Gets all the records in the module.
-    #     :return: (list) A list of dictionaries, where each dictionary is a record.
-    #              Will return all records within a module.
-    #     """
-    #     # Get total record count
-    #     url = f"/module/{self.module_name}?page[number]=1&page[size]=1"
-    #     pages = (
-    #         math.ceil(
-    #             self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")["meta"][
-    #                 "total-pages"
-    #             ]
-    #             / record_per_page
-    #         )
-    #         + 1
-    #     )
-    #     result = []
-    #     for page in range(1, pages):
-    #         url = f"/module/{self.module_name}?page[number]={page}&page[size]={record_per_page}"
-    #         result.extend(self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get"))
-
-    #     for record in result:
-    #         print(type(record))
-    #     return result
+        :return: (Iterator[dict]) Records, one at a time.
+        """
+        url = _records_url(self.module_name, fields, sort, operator, filters or {})
+        page_number = 1
+        while page_number:
+            result = self.suitecrm.request(
+                f"{self.suitecrm.baseurl}{_page_url(url, page_number, page_size)}",
+                "get",
+            )
+            page_number = _next_page_number(result, page_number)
+            yield from _records(result)
 
     def get_all(self) -> dict:
         url = f"/module/{self.module_name}"
@@ -404,3 +460,517 @@ class Module:
         """
         url = f"/module/{self.module_name}/{record_id}/relationships/{related_module_name.lower()}/{related_bean_id}"
         return self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "delete")
+
+
+class AsyncSuiteCRM:
+    """
+    Asynchronous counterpart of SuiteCRM built on a shared httpx.AsyncClient, so that
+    in-flight MintHCM calls do not hold worker threads.
+
+    If the credentials are rejected, they are loaded again with credentials_loader and the
+    request is retried once, so a long-lived connection picks up rotated credentials.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        url: str,
+        credentials_loader: Optional[Callable[[], Awaitable[tuple]]] = None,
+    ):
+        self.baseurl = url
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._credentials_loader = credentials_loader
+        self._headers = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36"
+        )
+        self._token_store = get_token_store()
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return get_http_client(self.baseurl)
+
+    def __getattr__(self, module_name: str) -> "AsyncModule":
+        if module_name in MODULE_NAMES:
+            return AsyncModule(self, module_name)
+        raise AttributeError(module_name)
+
+    async def _fetch_token(self) -> dict:
+        """
+        Fetch a new token from the token access url using client credentials grant.
+        :return: (dictionary) The token
+        """
+        response = await self._client.post(
+            self.baseurl[:-2] + "access_token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self._client_id,
+                "client_secret": self._client_secret,
+            },
+        )
+        if response.status_code in (400, 401):
+            raise AuthenticationError("401 (Unauthorized) - client id/secret")
+        return response.json()
+
+    async def _get_token(self, stale_token: dict = None) -> dict:
+        """
+        Get a valid token from the token store, refreshing it only once for concurrent callers.
+
+        :param stale_token: (dictionary) Token that was rejected by the server and has to be replaced.
+        :return: (dictionary) The token
+        """
+        return await self._token_store.aget_valid_token(
+            self._client_id, self._fetch_token, stale_token
+        )
+
+    async def request(self, url: str, method, parameters="") -> dict:
+        """
+        Makes a request to the given url with a specific method and data. If the request fails because the token expired
+        the session will re-authenticate and attempt the request again with a new token. If the credentials were
+        rejected and they have changed since, the request is attempted again with the new credentials.
+
+        :param url: (string) The url
+        :param method: (string) Get, Post, Patch, Delete
+        :param parameters: (dictionary) Data to be posted
+
+        :return: (dictionary) Data
+        """
+        try:
+            return await self._request(url, method, parameters)
+        except AuthenticationError:
+            if not await self._reload_credentials():
+                raise
+            return await self._request(url, method, parameters)
+
+    async def _reload_credentials(self) -> bool:
+        """
+        Load the credentials again, e.g. after they were rotated.
+
+        :return: (bool) True if the credentials have changed
+        """
+        if self._credentials_loader is None:
+            return False
+        client_id, client_secret = await self._credentials_loader()
+        if not client_id or (client_id, client_secret) == (
+            self._client_id,
+            self._client_secret,
+        ):
+            return False
+        self._client_id = client_id
+        self._client_secret = client_secret
+        return True
+
+    async def _request(self, url: str, method, parameters="") -> dict:
+        url = quote(url, safe="/:?=&")
+        content = None if parameters == "" else json.dumps({"data": parameters})
+
+        token = await self._get_token()
+        for attempt in range(2):
+            response = await self._client.request(
+                method.upper(),
+                url,
+                content=content,
+                headers={
+                    "User-Agent": self._headers,
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {token['access_token']}",
+                },
+            )
+            # Revoked Token
+            if response.status_code != 401 or attempt == 1:
+                break
+            token = await self._get_token(stale_token=token)
+
+        if response.status_code == 401:
+            raise AuthenticationError(
+                "401 (Unauthorized) client id/secret has been revoked, new token was attempted and failed."
+            )
+
+        # Database Failure
+        # SuiteCRM does not allow to query by a custom field see README, #Limitations
+        if response.status_code == 400 and "Database failure." in response.text:
+            raise Exception(response.text)
+
+        return response.json()
+
+    async def get_modules(self) -> list:
+        """
+        Gets all the modules that are available in the SuiteCRM.
+        :return: (list) A list of all the modules.
+        """
+        cache_key = (self.baseurl, "modules")
+        modules = metadata_cache.get(cache_key)
+        if modules is None:
+            url = "/meta/modules"
+            module_response = await self.request(f"{self.baseurl}{url}", "get")
+            modules = list(module_response["data"]["attributes"].keys())
+            metadata_cache.set(cache_key, modules)
+        return list(modules)
+
+
+class AsyncModule:
+    def __init__(self, suitecrm: AsyncSuiteCRM, module_name: str):
+        self.module_name = module_name
+        self.suitecrm = suitecrm
+
+    async def create(self, **attributes) -> dict:
+        """
+        Creates a record with given attributes
+        :param attributes: (**kwargs) fields with data you want to populate the record with.
+
+        :return: (dictionary) The record that was created with the attributes.
+        """
+        url = "/module"
+        data = {
+            "type": self.module_name,
+            "id": str(uuid.uuid4()),
+            "attributes": attributes,
+        }
+        return await self.suitecrm.request(
+            f"{self.suitecrm.baseurl}{url}", "post", data
+        )
+
+    async def delete(self, record_id: str) -> dict:
+        """
+        Delete a specific record by id.
+        :param record_id: (string) The record id within the module you want to delete.
+
+        :return: (dictionary) Confirmation of deletion of record.
+        """
+        url = f"/module/{self.module_name}/{record_id}"
+        return await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "delete")
+
+    async def fields(self) -> dict:
+        """
+        Gets all the attributes that can be set in a record.
+        :return: (dictionary) Names of attributes in a record with their database types.
+        """
+        cache_key = (self.suitecrm.baseurl, "fields", self.module_name)
+        fields = metadata_cache.get(cache_key)
+        if fields is None:
+            url = f"/meta/fields/{self.module_name}"
+            result = await self.suitecrm.request(
+                f"{self.suitecrm.baseurl}{url}", "get"
+            )
+            fields = _short_fields(result)
+            metadata_cache.set(cache_key, fields)
+        return fields
+
+    async def get(
+        self, fields: list = None, sort: str = None, operator: str = "and", **filters
+    ) -> list:
+        """
+        Gets records given a specific id or filters, see Module.get.
+
+        :return: (list) A list of dictionaries, where each dictionary is a record.
+        """
+        sort = f"-{sort}" if sort else None
+        url = _records_url(self.module_name, fields, sort, operator, filters)
+        result = await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+        return _records(result)
+
+    async def get_page(
+        self,
+        page_number: int,
+        page_size: int,
+        fields: list = None,
+        filters: dict = None,
+        sort: str = None,
+        operator: str = "and",
+    ) -> dict:
+        """
+        Gets a single page of records matching the filters, see Module.get_page.
+
+        :return: (dictionary) The JSON:API response with 'data' and 'meta' keys.
+        """
+        url = _records_url(self.module_name, fields, sort, operator, filters or {})
+        url = _page_url(url, page_number, page_size)
+        result = await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+        _records(result)
+        return result
+
+    async def count(self, filters: dict = None, operator: str = "and") -> int:
+        """
+        Counts records matching the filters, see Module.count.
+
+        :return: (int) Number of matching records.
+        """
+        result = await self.get_page(1, 1, ["id"], filters, None, operator)
+        return _total_pages(result, len(result["data"]))
+
+    async def get_all(self) -> dict:
+        url = f"/module/{self.module_name}"
+        return await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+
+    async def iter_records(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        fields: list = None,
+        filters: dict = None,
+        sort: str = None,
+        operator: str = "and",
+    ) -> AsyncIterator[dict]:
+        """
+        Iterates over all records matching the filters. The next page is requested while the
+        caller processes the current one, so at most two pages are held in memory. The pending
+        request is cancelled when the iterator is closed, iterate within contextlib.aclosing
+        so it is closed as soon as the iteration stops early, not when it is garbage collected.
+
+        :param page_size: (int) Number of records requested per page.
+        :param fields: (list) A list of fields you want to be returned from each record.
+        :param filters: (dictionary) Filters to apply, see Module.get.
+        :param sort: (string) The field you want the records to be sorted by, prefixed with '-' for descending order.
+        :param operator: (string) Operator joining the filters, 'and' or 'or'.
+
+        :return: (AsyncIterator[dict]) Records, one at a time.
+        """
+        url = _records_url(self.module_name, fields, sort, operator, filters or {})
+
+        def fetch(page_number: int) -> asyncio.Task:
+            page_url = _page_url(url, page_number, page_size)
+            return asyncio.create_task(
+                self.suitecrm.request(f"{self.suitecrm.baseurl}{page_url}", "get")
+            )
+
+        page_number = 1
+        next_page = fetch(page_number)
+        try:
+            while next_page is not None:
+                result = await next_page
+                page_number = _next_page_number(result, page_number)
+                next_page = fetch(page_number) if page_number else None
+                for record in _records(result):
+                    yield record
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def update(self, record_id: str, **attributes) -> dict:
+        """
+        updates a record.
+
+        :param record_id: (string) id of the current module record.
+        :param attributes: (**kwargs) fields inside of the record to be updated.
+
+        :return: (dictionary) The updated record
+        """
+        url = "/module"
+        data = {"type": self.module_name, "id": record_id, "attributes": attributes}
+        return await self.suitecrm.request(
+            f"{self.suitecrm.baseurl}{url}", "patch", data
+        )
+
+    async def get_relationship(self, record_id: str, related_module_name: str) -> dict:
+        """
+        returns the relationship between this record and another module.
+
+        :param record_id: (string) id of the current module record.
+        :param related_module_name: (string) the module name you want to search relationships for, ie. Contacts.
+
+        :return: (dictionary) A list of relationships that this module's record contains with the related module.
+        """
+        url = f"/module/{self.module_name}/{record_id}/relationships/{related_module_name.lower()}"
+        return await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "get")
+
+    async def create_relationship(
+        self, record_id: str, related_module_name: str, related_bean_id: str
+    ) -> dict:
+        """
+        Creates a relationship between 2 records.
+
+        :param record_id: (string) id of the current module record.
+        :param related_module_name: (string) the module name of the record you want to create a relationship,
+               ie. Contacts.
+        :param related_bean_id: (string) id of the record inside of the other module.
+
+        :return: (dictionary) A record that the relationship was created.
+        """
+        url = f"/module/{self.module_name}/{record_id}/relationships"
+        data = {"type": related_module_name.capitalize(), "id": related_bean_id}
+        return await self.suitecrm.request(
+            f"{self.suitecrm.baseurl}{url}", "post", data
+        )
+
+    async def delete_relationship(
+        self, record_id: str, related_module_name: str, related_bean_id: str
+    ) -> dict:
+        """
+        Deletes a relationship between 2 records.
+
+        :param record_id: (string) id of the current module record.
+        :param related_module_name: (string) the module name of the record you want to delete a relationship,
+               ie. Contacts.
+        :param related_bean_id: (string) id of the record inside of the other module.
+
+        :return: (dictionary) A record that the relationship was deleted.
+        """
+        url = f"/module/{self.module_name}/{record_id}/relationships/{related_module_name.lower()}/{related_bean_id}"
+        return await self.suitecrm.request(f"{self.suitecrm.baseurl}{url}", "delete")
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    Returns the process-wide keep-alive client for the host of the given url.
+
+    :param url: (string) Any url of the MintHCM instance.
+
+    :return: (httpx.AsyncClient) Shared client with per-host connection limits.
+    """
+    host = httpx.URL(url).host
+    client = _http_clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=REQUEST_TIMEOUT,
+        )
+        _http_clients[host] = client
+    return client
+
+
+def invalidate_metadata(url: str = None, module_name: str = None) -> None:
+    """
+    Drops cached module lists and fields, e.g. after modules were changed in MintHCM studio.
+
+    :param url: (string) The api url of the MintHCM instance, all instances if not given.
+    :param module_name: (string) Drop only fields of this module, everything if not given.
+    """
+
+    def matches(key: tuple) -> bool:
+        if url is not None and key[0] != url:
+            return False
+        return module_name is None or key[1:] == ("fields", module_name)
+
+    metadata_cache.invalidate(matches)
+
+
+async def close_http_clients() -> None:
+    """
+    Closes all shared http clients, to be called on application shutdown.
+    """
+    for client in _http_clients.values():
+        await client.aclose()
+    _http_clients.clear()
+
+
+def _records_url(
+    module_name: str, fields: list, sort: str, operator: str, filters: dict
+) -> str:
+    """
+    Builds the JSON:API url used to list module records.
+
+    :param module_name: (string) The name of the module.
+    :param fields: (list) A list of fields you want to be returned from each record.
+    :param sort: (string) The field you want the records to be sorted by, prefixed with '-' for descending order.
+    :param operator: (string) Operator joining the filters, 'and' or 'or'.
+    :param filters: (dictionary) Filters to apply, see Module.get.
+
+    :return: (string) The url relative to the api base url.
+    """
+    # Fields Constructor
+    if fields:
+        fields = f"?fields[{module_name}]=" + ",".join(fields)
+        url = f"/module/{module_name}{fields}&filter"
+    else:
+        url = f"/module/{module_name}?filter"
+    if operator == "and" or operator == "or":
+        url = f"{url}[operator]={operator}&filter"
+    else:
+        url = f"{url}[operator]=and&filter"  # Olka TODO
+
+    # Filter Constructor
+    operators = {
+        "=": "EQ",
+        "<>": "NEQ",
+        ">": "GT",
+        ">=": "GTE",
+        "<": "LT",
+        "<=": "LTE",
+        "LIKE": "LIKE",
+        "NOT LIKE": "NOT_IKE",
+        "IN": "IN",
+        "NOT IN": "NOT_IN",
+    }
+    for field, value in filters.items():
+        if isinstance(value, dict):
+            if value["operator"] == "BETWEEN":
+                # in value there are two values separated by comma
+                values = value["value"].split(",")
+                url = f'{url}[{field}][{operators[">"]}]= {values[0]}&'
+                url = f'{url}[{field}][{operators["<"]}]= {values[1]}&'
+
+            else:
+                url = f'{url}[{field}][{operators[value["operator"]]}]={value["value"]}&'
+        else:
+            url = f"{url}[{field}][eq]={value}&"
+    if filters:
+        url = url[:-1]
+    else:
+        url = url[: -len("&filter")]
+
+    # Sort
+    if sort:
+        url = f"{url}&sort={sort}"
+    return url
+
+
+def _page_url(url: str, page_number: int, page_size: int) -> str:
+    return f"{url}&page[number]={page_number}&page[size]={page_size}"
+
+
+def _total_pages(result: dict, default: int) -> int:
+    total_pages = result.get("meta", {}).get("total-pages")
+    return default if total_pages is None else int(total_pages)
+
+
+def _next_page_number(result: dict, page_number: int) -> int:
+    """
+    Finds the number of the page following the given one.
+
+    :param result: (dictionary) The response for the current page.
+    :param page_number: (int) The number of the current page.
+
+    :return: (int) Number of the next page or 0 if the current page is the last one.
+    """
+    total_pages = result.get("meta", {}).get("total-pages")
+    if total_pages is not None:
+        return page_number + 1 if page_number < int(total_pages) else 0
+    return page_number + 1 if result.get("links", {}).get("next") else 0
+
+
+def _records(result: dict) -> list:
+    """
+    Extracts records from the JSON:API response.
+
+    :param result: (dictionary) The response of the module records endpoint.
+
+    :return: (list) A list of dictionaries, where each dictionary is a record.
+    """
+    # TODO Olka
+    if "data" in result:
+        return result["data"]
+    if "errors" in result:
+        raise Exception(result["errors"])
+    raise Exception(result["errors"])
+
+
+def _short_fields(result: dict) -> dict:
+    """
+    Reduces the response of the fields metadata endpoint to field names and their database types.
+
+    :param result: (dictionary) The response of the fields metadata endpoint.
+
+    :return: (dictionary) Field names mapped to {"dbType": ...}, ie. {"id": {"dbType": "id"}}
+    """
+    if "errors" in result:
+        raise Exception(result["errors"])
+    if "data" in result:
+        attributes = result["data"]["attributes"]
+        return {key: {"dbType": value["dbType"]} for key, value in attributes.items()}
+    raise Exception(result)
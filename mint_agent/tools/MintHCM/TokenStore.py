@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+from functools import cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterator, Optional
+
+from cryptography.fernet import Fernet
+from dotenv import load_dotenv
+from loguru import logger
+from pymongo import MongoClient
+
+from mint_agent.database.db_utils import get_db_name, get_sync_client
+
+load_dotenv()
+
+# Tokens are refreshed this many seconds before they expire
+REFRESH_MARGIN = 60
+
+
+class TokenStore(ABC):
+    """
+    Abstract base class for OAuth2 token stores keyed by API client_id.
+
+    Besides the storage interface it provides single-flight refresh helpers: concurrent
+    callers that find an expired (or soon to expire) token trigger one refresh together.
+    Refresh locks exist only while a refresh is waited for, asynchronous ones are kept per
+    event loop, as an asyncio.Lock can not be shared between loops.
+    """
+
+    blocking: bool = False
+
+    def __init__(self) -> None:
+        # Locks keyed by client_id (threads) or (event loop, client_id), with numbers of their users
+        self._locks: dict[Hashable, tuple[Any, int]] = {}
+        self._locks_guard = threading.Lock()
+
+    @abstractmethod
+    def get(self, client_id: str) -> Optional[dict]:
+        """
+        Get token stored for the given client.
+
+        Args:
+            client_id (str): The API client_id.
+
+        Returns:
+            Optional[dict]: The token with 'access_token' and 'expires_at' keys or None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, client_id: str, token: dict) -> None:
+        """
+        Store token for the given client.
+
+        Args:
+            client_id (str): The API client_id.
+            token (dict): The token with 'access_token' and 'expires_at' keys.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, client_id: str) -> None:
+        """
+        Remove token stored for the given client.
+
+        Args:
+            client_id (str): The API client_id.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def is_valid(token: Optional[dict], stale_token: Optional[dict] = None) -> bool:
+        """
+        Check if the token can still be used.
+
+        Args:
+            token (Optional[dict]): The token to check.
+            stale_token (Optional[dict]): Token rejected by the server that must not be reused.
+
+        Returns:
+            bool: True if the token exists, was not rejected and is not about to expire.
+        """
+        if not token:
+            return False
+        if stale_token and token["access_token"] == stale_token.get("access_token"):
+            return False
+        return token.get("expires_at", 0) - REFRESH_MARGIN > time.time()
+
+    def get_valid_token(
+        self,
+        client_id: str,
+        fetch_token: Callable[[], dict],
+        stale_token: Optional[dict] = None,
+    ) -> dict:
+        """
+        Get a valid token, fetching a new one if needed. Thread-safe, one fetch per client at a time.
+
+        Args:
+            client_id (str): The API client_id.
+            fetch_token (Callable[[], dict]): Function fetching a new token from the API.
+            stale_token (Optional[dict]): Token rejected by the server that has to be replaced.
+
+        Returns:
+            dict: The valid token.
+        """
+        token = self.get(client_id)
+        if self.is_valid(token, stale_token):
+            return token
+        with self._lock(client_id):
+            token = self.get(client_id)
+            if self.is_valid(token, stale_token):
+                return token
+            token = _with_expires_at(fetch_token())
+            self.set(client_id, token)
+            return token
+
+    async def aget_valid_token(
+        self,
+        client_id: str,
+        fetch_token: Callable[[], Awaitable[dict]],
+        stale_token: Optional[dict] = None,
+    ) -> dict:
+        """
+        Asynchronous version of get_valid_token, one fetch per client at a time.
+
+        Args:
+            client_id (str): The API client_id.
+            fetch_token (Callable[[], Awaitable[dict]]): Coroutine function fetching a new token from the API.
+            stale_token (Optional[dict]): Token rejected by the server that has to be replaced.
+
+        Returns:
+            dict: The valid token.
+        """
+        token = await self._call(self.get, client_id)
+        if self.is_valid(token, stale_token):
+            return token
+        async with self._async_lock(client_id):
+            token = await self._call(self.get, client_id)
+            if self.is_valid(token, stale_token):
+                return token
+            token = _with_expires_at(await fetch_token())
+            await self._call(self.set, client_id, token)
+            return token
+
+    async def _call(self, method: Callable, *args) -> any:
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    @contextmanager
+    def _lock(self, client_id: str) -> Iterator[None]:
+        lock = self._acquire_lock_entry(client_id, threading.Lock)
+        try:
+            with lock:
+                yield
+        finally:
+            self._release_lock_entry(client_id)
+
+    @asynccontextmanager
+    async def _async_lock(self, client_id: str) -> AsyncIterator[None]:
+        key = (asyncio.get_running_loop(), client_id)
+        lock = self._acquire_lock_entry(key, asyncio.Lock)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._release_lock_entry(key)
+
+    def _acquire_lock_entry(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._locks_guard:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = factory()
+            self._locks[key] = (lock, users + 1)
+            return lock
+
+    def _release_lock_entry(self, key: Hashable) -> None:
+        with self._locks_guard:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+class InMemoryTokenStore(TokenStore):
+    """
+    Process-local token store.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tokens: dict[str, dict] = {}
+
+    def get(self, client_id: str) -> Optional[dict]:
+        return self._tokens.get(client_id)
+
+    def set(self, client_id: str, token: dict) -> None:
+        self._tokens[client_id] = token
+
+    def delete(self, client_id: str) -> None:
+        self._tokens.pop(client_id, None)
+
+
+class MongoTokenStore(InMemoryTokenStore):
+    """
+    Token store persisting Fernet-encrypted tokens in MongoDB, so they survive restarts and are
+    shared between server processes. Tokens are kept in memory as well, so MongoDB is only
+    queried when a token is missing locally or has to be refreshed.
+    """
+
+    blocking: bool = True
+
+    def __init__(self, client: MongoClient, db_name: str) -> None:
+        super().__init__()
+        self.collection = client[db_name]["mint_tokens"]
+        self._fernet = Fernet(os.getenv("FERNET_KEY").encode())
+
+    def get(self, client_id: str) -> Optional[dict]:
+        token = super().get(client_id)
+        if self.is_valid(token):
+            return token
+        try:
+            document = self.collection.find_one({"_id": client_id})
+        except Exception as e:
+            logger.error(f"Error while reading token from database: {e}")
+            return token
+        if document is None:
+            return token
+        token = json.loads(self._fernet.decrypt(document["token"]))
+        super().set(client_id, token)
+        return token
+
+    def set(self, client_id: str, token: dict) -> None:
+        super().set(client_id, token)
+        try:
+            self.collection.update_one(
+                {"_id": client_id},
+                {
+                    "$set": {
+                        "token": self._fernet.encrypt(json.dumps(token).encode()),
+                        "expires_at": token["expires_at"],
+                    }
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.error(f"Error while saving token to database: {e}")
+
+    def delete(self, client_id: str) -> None:
+        super().delete(client_id)
+        try:
+            self.collection.delete_one({"_id": client_id})
+        except Exception as e:
+            logger.error(f"Error while deleting token from database: {e}")
+
+
+def _with_expires_at(token: dict) -> dict:
+    if "expires_at" not in token:
+        token["expires_at"] = time.time() + float(token.get("expires_in", 3600))
+    return token
+
+
+@cache
+def get_token_store() -> TokenStore:
+    """
+    Returns the process-wide token store selected with the MINT_TOKEN_STORE variable ('memory' or 'mongo').
+
+    Returns:
+        TokenStore: The token store.
+    """
+    if os.getenv("MINT_TOKEN_STORE", "memory") == "mongo":
+        return MongoTokenStore(get_sync_client(), get_db_name())
+    return InMemoryTokenStore()
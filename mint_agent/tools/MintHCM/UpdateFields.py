@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, Type
 
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import BaseTool, ToolException
 from pydantic import BaseModel, Field
@@ -46,3 +49,21 @@ class MintUpdateFieldsTool(BaseTool, MintBaseTool):
 
         except Exception as e:
             raise ToolException(f"Error: {e}")
+
+    async def _arun(
+        self,
+        module_name: str,
+        id: str,
+        attributes: Dict[str, Any],
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Dict[str, Any]:
+        try:
+            suitecrm = await self.get_async_connection(config)
+            url = f"{self.api_url}/module"
+            data = {"type": module_name, "id": id, "attributes": attributes}
+            await suitecrm.request(url, "patch", parameters=data)
+            return "Updated field in module " + module_name + " with ID " + id
+
+        except Exception as e:
+            raise ToolException(f"Error: {e}")
@@ -1,3 +1,8 @@
+import os
+import re
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.tools import ToolException
 from loguru import logger
 
@@ -15,6 +20,8 @@ from mint_agent.tools.MintHCM.GetUsers import MintGetUsersTool
 from mint_agent.tools.MintHCM.Search import MintSearchTool
 from mint_agent.tools.MintHCM.UpdateFields import MintUpdateFieldsTool
 
+load_dotenv()
+
 
 def _handle_tool_error(error: ToolException) -> str:
     # find if what was returned contains phrase "Module ... does not exist"
@@ -77,6 +84,139 @@ class ToolController:
         "CalendarTool",
     ]
 
+    # Tools without side effects, which may be executed before the user accepts them
+    read_only_tools = [
+        "MintGetModuleNamesTool",
+        "MintGetModuleFieldsTool",
+        "MintSearchTool",
+        "MintGetUsersTool",
+        "MintGetRelTool",
+        "CalendarTool",
+        "AvailabilityTool",
+    ]
+
+    # Tools bound to the model in every turn when tool selection is enabled
+    core_tools = [
+        "MintGetModuleNamesTool",
+        "MintGetModuleFieldsTool",
+        "MintSearchTool",
+    ]
+
+    # Groups of tools selected when the user's message contains one of their keywords as a whole word
+    tool_groups = {
+        "records": {
+            "tools": [
+                "MintCreateRecordTool",
+                "UpdateFieldsTool",
+                "MintDeleteRecordTool",
+            ],
+            "keywords": [
+                "add",
+                "adds",
+                "added",
+                "create",
+                "creates",
+                "created",
+                "update",
+                "updates",
+                "updated",
+                "change",
+                "changes",
+                "changed",
+                "edit",
+                "edits",
+                "edited",
+                "modify",
+                "modified",
+                "rename",
+                "renamed",
+                "delete",
+                "deletes",
+                "deleted",
+                "remove",
+                "removes",
+                "removed",
+            ],
+        },
+        "relationships": {
+            "tools": ["MintCreateRelTool", "MintDeleteRelTool", "MintGetRelTool"],
+            "keywords": [
+                "relationship",
+                "relationships",
+                "related",
+                "link",
+                "linked",
+                "unlink",
+                "connect",
+                "connected",
+                "assign",
+                "assigned",
+                "attach",
+                "attached",
+                "detach",
+                "belongs",
+                "participant",
+                "participants",
+                "attendee",
+                "attendees",
+            ],
+        },
+        "meetings": {
+            "tools": [
+                "MintCreateMeetingTool",
+                "CalendarTool",
+                "AvailabilityTool",
+                "MintGetUsersTool",
+            ],
+            "keywords": [
+                "meeting",
+                "meetings",
+                "meet",
+                "schedule",
+                "scheduled",
+                "calendar",
+                "appointment",
+                "appointments",
+                "invite",
+                "invited",
+                "available",
+                "availability",
+                "busy",
+                "today",
+                "tomorrow",
+                "yesterday",
+            ],
+        },
+        "users": {
+            "tools": ["MintGetUsersTool"],
+            "keywords": [
+                "user",
+                "users",
+                "employee",
+                "employees",
+                "colleague",
+                "colleagues",
+                "manager",
+                "managers",
+            ],
+        },
+    }
+
+    # Selection changes the tool set between turns, which would invalidate the prompt cache
+    # starting at the tool definitions, so it is disabled when prompt caching is enabled
+    tool_selection = (
+        os.getenv("TOOL_SELECTION", "FALSE") == "TRUE"
+        and os.getenv("ANTHROPIC_PROMPT_CACHING", "FALSE") != "TRUE"
+    )
+
+    _group_patterns = {
+        group: re.compile(
+            r"\b(?:" + "|".join(map(re.escape, config["keywords"])) + r")\b",
+            re.IGNORECASE,
+        )
+        for group, config in tool_groups.items()
+    }
+
     @staticmethod
     def get_available_tools():
         return ToolController.available_tools
@@ -89,8 +229,63 @@ class ToolController:
     def get_safe_tools():
         return ToolController.safe_tools
 
+    @staticmethod
+    def get_read_only_tools():
+        return ToolController.read_only_tools
+
     @staticmethod
     def get_tools():
         available_tools = ToolController.get_available_tools()
         default_tools = ToolController.get_default_tools()
         return [available_tools[tool] for tool in default_tools]
+
+    @staticmethod
+    def select_tools(messages: list, tool_names: list[str] = None) -> list:
+        """
+        Select tools to bind to the model for the current turn. Core tools are always selected,
+        tool groups are selected by keywords of the last user's message and tools already
+        called in the turn are kept. All tools are selected if no group matches the message,
+        or if tool selection is disabled with TOOL_SELECTION variable or by prompt caching.
+
+        Selected tools keep the order of tool_names, so the same selection gives the same
+        tool set and the controller bound to it can be reused.
+
+        Args:
+            messages (list): Messages of the conversation.
+            tool_names (list[str]): Names of the tools enabled for the user. Defaults to default tools.
+
+        Returns:
+            list: The selected tools.
+        """
+        available_tools = ToolController.get_available_tools()
+        tool_names = tool_names or ToolController.get_default_tools()
+        if not ToolController.tool_selection:
+            return [available_tools[tool] for tool in tool_names]
+
+        turn_start = 0
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                turn_start = index
+                break
+        text = messages[turn_start].content if messages else ""
+        if not isinstance(text, str):
+            text = " ".join(
+                block.get("text", "") for block in text if isinstance(block, dict)
+            )
+
+        matched_groups = [
+            group
+            for group, pattern in ToolController._group_patterns.items()
+            if pattern.search(text)
+        ]
+        if not matched_groups:
+            return [available_tools[tool] for tool in tool_names]
+
+        selected = set(ToolController.core_tools)
+        for group in matched_groups:
+            selected.update(ToolController.tool_groups[group]["tools"])
+        for message in messages[turn_start:]:
+            if isinstance(message, AIMessage):
+                selected.update(tool_call["name"] for tool_call in message.tool_calls)
+
+        return [available_tools[tool] for tool in tool_names if tool in selected]
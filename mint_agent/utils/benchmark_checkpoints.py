@@ -0,0 +1,342 @@
+"""
+Benchmarks of the MongoDB checkpoint storage. They require the MongoDB configured with MONGO_URI and
+MONGO_DB_NAME, data is written to temporary collections which are dropped afterwards.
+
+The serde benchmark runs without the database.
+
+Usage:
+    poetry run benchmark_checkpoints [state_load|compaction] [checkpoint counts...]
+    poetry run benchmark_checkpoints serde [history turns...]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.base import Checkpoint, empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+from mint_agent.database.db_utils import (
+    CheckpointRetention,
+    CheckpointRetentionType,
+    MongoDBCheckpointSaver,
+    close_clients,
+    get_async_client,
+    get_db_name,
+)
+from mint_agent.database.serde import (
+    ZSTD_AVAILABLE,
+    JsonPlusSerializerCompat,
+    OrjsonSerializer,
+)
+
+load_dotenv()
+
+DEFAULT_COUNTS = [100, 1000, 5000]
+CHATS_PER_USER = 10
+READ_REPEATS = 50
+COMPACTION_KEEP = 10
+DEFAULT_HISTORY_TURNS = [5, 25, 100]
+SERDE_REPEATS = 20
+
+
+def sample_messages(turns: int) -> list:
+    """
+    Build a chat history resembling agent conversations with tool calls.
+    """
+    messages = []
+    for turn in range(turns):
+        call_id = f"toolu_{uuid.uuid4().hex[:24]}"
+        messages.extend(
+            [
+                HumanMessage(
+                    content=f"Show me meetings planned for next week, turn {turn}",
+                    id=str(uuid.uuid4()),
+                ),
+                AIMessage(
+                    content=[
+                        {"type": "text", "text": "Let me search for the meetings."},
+                        {
+                            "type": "tool_use",
+                            "id": call_id,
+                            "name": "MintSearchTool",
+                            "input": {"module_name": "Meetings"},
+                        },
+                    ],
+                    tool_calls=[
+                        {
+                            "id": call_id,
+                            "name": "MintSearchTool",
+                            "args": {
+                                "module_name": "Meetings",
+                                "filters": '{"filters": {"date_start": {"operator": "BETWEEN", "value": "2024-09-02,2024-09-09"}}}',
+                                "operator": "and",
+                                "fields": "id,name,date_start,date_end,status",
+                            },
+                        }
+                    ],
+                    usage_metadata={
+                        "input_tokens": 2500,
+                        "output_tokens": 120,
+                        "total_tokens": 2620,
+                    },
+                    id=str(uuid.uuid4()),
+                ),
+                ToolMessage(
+                    content=str(
+                        {
+                            "data": [
+                                {
+                                    "id": str(uuid.uuid4()),
+                                    "name": f"Meeting {i}",
+                                    "date_start": "2024-09-03 10:00:00",
+                                    "date_end": "2024-09-03 11:00:00",
+                                    "status": "Planned",
+                                }
+                                for i in range(5)
+                            ]
+                        }
+                    ),
+                    tool_call_id=call_id,
+                    id=str(uuid.uuid4()),
+                ),
+                AIMessage(
+                    content="| Meeting | Start | End |\n|---|---|---|\n"
+                    + "\n".join(
+                        f"| Meeting {i} | 2024-09-03 10:00 | 2024-09-03 11:00 |"
+                        for i in range(5)
+                    ),
+                    id=str(uuid.uuid4()),
+                ),
+            ]
+        )
+    return messages
+
+
+def sample_checkpoint(messages: list, step: int) -> Checkpoint:
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid6(clock_seq=step))
+    checkpoint["channel_values"] = {
+        "messages": messages,
+        "system_prompt": "You are a helpful assistant. " * 40,
+        "conversation_summary": None,
+        "tool_accept": False,
+        "history_token_count": 2500,
+    }
+    checkpoint["channel_versions"] = {
+        channel: step for channel in checkpoint["channel_values"]
+    }
+    return checkpoint
+
+
+async def fill(saver: MongoDBCheckpointSaver, user_id: str, count: int) -> dict:
+    """
+    Write count checkpoints spread over CHATS_PER_USER chats of the user.
+
+    Returns:
+        dict: Config of the last chat, used to measure reads.
+    """
+    messages = sample_messages(4)
+    parents = {}
+    config = None
+    for step in range(count):
+        chat_id = f"chat_{step % CHATS_PER_USER}"
+        config = {
+            "configurable": {
+                "user_id": user_id,
+                "chat_id": chat_id,
+                "checkpoint_id": parents.get(chat_id),
+            }
+        }
+        checkpoint = sample_checkpoint(messages, step)
+        config = await saver.aput(
+            config,
+            checkpoint,
+            {"source": "loop", "step": step, "writes": None},
+            checkpoint["channel_versions"],
+        )
+        parents[chat_id] = checkpoint["id"]
+    chat_id = config["configurable"]["chat_id"]
+    return {"configurable": {"user_id": user_id, "chat_id": chat_id}}
+
+
+async def measure_aget(
+    saver: MongoDBCheckpointSaver, config: dict
+) -> tuple[float, float]:
+    """
+    Measure latency of loading the latest checkpoint.
+
+    Returns:
+        tuple[float, float]: Median and 95th percentile latency in milliseconds.
+    """
+    timings = []
+    for _ in range(READ_REPEATS):
+        start = time.perf_counter()
+        await saver.aget_tuple(config)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+async def benchmark_state_load(counts: list[int]) -> None:
+    """
+    Compare state load latency with and without the (chat_id, checkpoint_id) index.
+    """
+    saver = MongoDBCheckpointSaver(
+        get_async_client(), get_db_name(), retention=CheckpointRetention()
+    )
+    print(
+        f"{'checkpoints':>12} {'indexed p50':>12} {'indexed p95':>12} "
+        f"{'no index p50':>13} {'no index p95':>13}  (ms)"
+    )
+    for count in counts:
+        user_id = f"benchmark_{uuid.uuid4().hex[:8]}"
+        collection = saver.db[f"{user_id}_chats"]
+        try:
+            config = await fill(saver, user_id, count)
+            indexed = await measure_aget(saver, config)
+            await collection.drop_index("chat_id_checkpoint_id")
+            not_indexed = await measure_aget(saver, config)
+            print(
+                f"{count:>12} {indexed[0]:>12.2f} {indexed[1]:>12.2f} "
+                f"{not_indexed[0]:>13.2f} {not_indexed[1]:>13.2f}"
+            )
+        finally:
+            await drop_user_collections(saver, user_id)
+
+
+def user_collections(user_id: str) -> list[str]:
+    return [
+        f"{user_id}_chats",
+        f"{user_id}_chat_blobs",
+        f"{user_id}_chat_messages",
+        f"{user_id}_chat_writes",
+    ]
+
+
+async def drop_user_collections(saver: MongoDBCheckpointSaver, user_id: str) -> None:
+    for collection_name in user_collections(user_id):
+        await saver.db.drop_collection(collection_name)
+
+
+async def collection_stats(saver: MongoDBCheckpointSaver, user_id: str) -> dict:
+    """
+    Returns:
+        dict: Number of documents, data size and storage size (in kB) of the checkpoint collections of the user.
+    """
+    total = {"count": 0, "size": 0, "storage": 0}
+    for collection_name in user_collections(user_id):
+        stats = await saver.db.command("collStats", collection_name)
+        total["count"] += stats.get("count", 0)
+        total["size"] += stats.get("size", 0) / 1024
+        total["storage"] += stats.get("storageSize", 0) / 1024
+    return total
+
+
+async def benchmark_compaction(counts: list[int]) -> None:
+    """
+    Compare collection size and state load latency before and after compaction keeping
+    COMPACTION_KEEP checkpoints per chat. Storage size is only reclaimed by MongoDB over time,
+    data size shows the immediate effect.
+    """
+    saver = MongoDBCheckpointSaver(
+        get_async_client(), get_db_name(), retention=CheckpointRetention()
+    )
+    # Nothing is written concurrently, so unreferenced blobs and messages can be removed at once
+    saver.gc_grace_seconds = 0
+    print(
+        f"{'':>8} {'documents':>10} {'data kB':>10} {'storage kB':>11} "
+        f"{'p50 ms':>8} {'p95 ms':>8}"
+    )
+    for count in counts:
+        user_id = f"benchmark_{uuid.uuid4().hex[:8]}"
+        saver.retention = CheckpointRetention()
+        try:
+            config = await fill(saver, user_id, count)
+            before = await collection_stats(saver, user_id)
+            before_latency = await measure_aget(saver, config)
+
+            saver.retention = CheckpointRetention(
+                CheckpointRetentionType.KEEP_LAST_N,
+                number_of_checkpoints=COMPACTION_KEEP,
+            )
+            for chat in range(CHATS_PER_USER):
+                await saver.compact(
+                    {"configurable": {"user_id": user_id, "chat_id": f"chat_{chat}"}}
+                )
+            after = await collection_stats(saver, user_id)
+            after_latency = await measure_aget(saver, config)
+
+            for label, stats, latency in (
+                ("before", before, before_latency),
+                ("after", after, after_latency),
+            ):
+                print(
+                    f"{label:>8} {stats['count']:>10} {stats['size']:>10.0f} "
+                    f"{stats['storage']:>11.0f} {latency[0]:>8.2f} {latency[1]:>8.2f}"
+                )
+        finally:
+            await drop_user_collections(saver, user_id)
+
+
+async def benchmark_serde(turns: list[int]) -> None:
+    """
+    Compare encode and decode time and size of checkpoints with chat histories of the given
+    number of turns for the available serializers.
+    """
+    serializers = {
+        "json": JsonPlusSerializerCompat(),
+        "orjson": OrjsonSerializer(compression_threshold=sys.maxsize),
+        f"orjson+{'zstd' if ZSTD_AVAILABLE else 'zlib'}": OrjsonSerializer(
+            compression_threshold=0
+        ),
+    }
+    print(
+        f"{'turns':>6} {'serializer':>12} {'size kB':>9} "
+        f"{'encode ms':>10} {'decode ms':>10}"
+    )
+    for turn_count in turns:
+        checkpoint = sample_checkpoint(sample_messages(turn_count), 1)
+        for name, serde in serializers.items():
+            encode_timings = []
+            decode_timings = []
+            for _ in range(SERDE_REPEATS):
+                start = time.perf_counter()
+                data = serde.dumps(checkpoint)
+                encode_timings.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                serde.loads(data)
+                decode_timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{turn_count:>6} {name:>12} {len(data) / 1024:>9.1f} "
+                f"{statistics.median(encode_timings):>10.2f} "
+                f"{statistics.median(decode_timings):>10.2f}"
+            )
+
+
+BENCHMARKS = {
+    "state_load": (benchmark_state_load, DEFAULT_COUNTS),
+    "compaction": (benchmark_compaction, DEFAULT_COUNTS),
+    "serde": (benchmark_serde, DEFAULT_HISTORY_TURNS),
+}
+
+
+def benchmark_checkpoints() -> None:
+    args = sys.argv[1:]
+    benchmarks = list(BENCHMARKS.values())
+    if args and args[0] in BENCHMARKS:
+        benchmarks = [BENCHMARKS[args.pop(0)]]
+    counts = [int(arg) for arg in args]
+
+    async def run() -> None:
+        for benchmark, default_counts in benchmarks:
+            await benchmark(counts or default_counts)
+
+    try:
+        asyncio.run(run())
+    finally:
+        close_clients()
@@ -8,3 +8,9 @@ class ServerError(Exception):
     def __init__(self, message: str):
         self.message = message
         super().__init__(self.message)
+
+
+class CheckpointError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
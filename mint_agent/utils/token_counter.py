@@ -0,0 +1,124 @@
+import os
+from functools import cache
+from typing import Optional
+
+import orjson
+import tiktoken
+from langchain_core.messages import BaseMessage
+from loguru import logger
+
+from mint_agent.utils.cache import TTLCache
+
+# Tokens added to every message for its role and separators
+MESSAGE_OVERHEAD = 4
+# Characters per token used when the tokenizer is not available
+CHARS_PER_TOKEN = 4
+
+# Token counts of messages keyed by message id, messages are not modified once added to the history
+message_token_cache = TTLCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", 3600)),
+)
+
+
+@cache
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Returns the tiktoken encoding selected with the TOKEN_ENCODING variable, None if the encoding
+    can not be loaded, in which case the token count is estimated from the text length.
+    """
+    try:
+        return tiktoken.get_encoding(os.getenv("TOKEN_ENCODING", "cl100k_base"))
+    except Exception as e:
+        logger.warning(f"Tokenizer not available, estimating token counts: {e}")
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_text(message: BaseMessage) -> str:
+    """
+    Get the text sent to the model for the message: text content, tool call inputs and results.
+    """
+    if isinstance(message.content, str):
+        parts = [message.content]
+    else:
+        parts = []
+        for block in message.content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif block.get("type") == "text":
+                parts.append(block["text"])
+            elif block.get("type") != "tool_use":
+                parts.append(orjson.dumps(block, default=str).decode())
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        parts.append(tool_call["name"])
+        parts.append(orjson.dumps(tool_call["args"], default=str).decode())
+    return "\n".join(parts)
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """
+    Count tokens of the message, counts of messages with an id are cached.
+
+    Args:
+        message (BaseMessage): The message.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if message.id is not None:
+        count = message_token_cache.get(message.id)
+        if count is not None:
+            return count
+    count = count_text_tokens(message_text(message)) + MESSAGE_OVERHEAD
+    if message.id is not None:
+        message_token_cache.set(message.id, count)
+    return count
+
+
+def count_tokens(messages: list[BaseMessage]) -> int:
+    """
+    Count tokens of the messages.
+
+    Args:
+        messages (list[BaseMessage]): The messages.
+
+    Returns:
+        int: The total number of tokens.
+    """
+    return sum(count_message_tokens(message) for message in messages)
+
+
+def find_token_cut(messages: list[BaseMessage], max_tokens: int) -> tuple[int, int]:
+    """
+    Find the first message to keep so that the kept messages fit in max_tokens. History has to
+    start with a human message, so the cut is made before a human message and the last human
+    message with its responses is always kept, even if it exceeds the limit.
+
+    Args:
+        messages (list[BaseMessage]): Messages of the conversation.
+        max_tokens (int): Maximum number of tokens of the kept messages.
+
+    Returns:
+        tuple[int, int]: Index of the first kept message and the number of tokens of the kept messages.
+    """
+    cut = len(messages)
+    kept_tokens = 0
+    tokens = 0
+    for index in range(len(messages) - 1, -1, -1):
+        tokens += count_message_tokens(messages[index])
+        if messages[index].type != "human":
+            continue
+        if tokens > max_tokens and cut < len(messages):
+            break
+        cut = index
+        kept_tokens = tokens
+    if cut == len(messages):
+        return 0, tokens
+    return cut, kept_tokens